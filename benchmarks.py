@@ -0,0 +1,639 @@
+"""Benchmark suite for the order book, matching, bots, option and spread chains,
+sessions, simulation, rendering, environments, risk and the results store.
+
+    python benchmarks.py -o results.json                 # run everything
+    python benchmarks.py -k session --max-iterations 1e6 # the full session grid
+    python benchmarks.py -k store --max-sessions 1e6     # queries on a 1M-session store
+    python benchmarks.py -o new.json --compare results.json
+
+Every benchmark times a fixed number of operations, repeated, and results are
+written as JSON (ns per op, ops per second) so runs can be compared. Books come
+from mock_bot.make_books. Import times of the core modules are tracked too, from
+python -X importtime.
+"""
+import argparse
+import atexit
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from mock_bot import (Bid, Offer, Book, Call, ComboChain, Market, OptionChain, Quote, Spread, Trader,
+                      book_kwargs, calc_n_quotes, display_books, make_books, quote_batch)
+from render import LadderRenderer
+
+BENCHMARKS = {}
+IMPORTS = ("mock_bot", "monte_carlo", "farm")  # modules whose import time is tracked
+
+def benchmark(name: str, **grid):
+    """Registers a benchmark for every combination of the grid's parameter values.
+    The decorated function takes the parameters and returns (run, n_ops), where
+    run() performs n_ops operations, or (run, n_ops, extra) with a dict of further
+    figures to record. A run() that returns a number has timed itself: the number
+    is the ns spent on its operations, leaving out untimed work between them.
+    """
+    def register(func):
+        keys = list(grid)
+        combos = [{}]
+        for k in keys:
+            combos = [dict(c, **{k: v}) for c in combos for v in grid[k]]
+        for params in combos:
+            label = name + "".join(f"[{k}={v}]" for k, v in params.items())
+            BENCHMARKS[label] = (func, params)
+        return func
+    return register
+
+def filled_book(depth: int, n_quotes: int, max_qty: int = 1) -> Book:
+    """A seeded book at steady state, with n_quotes of its quotes drawn ahead."""
+    book = make_books(1, n_quotes, depth=depth, max_qty=max_qty)[0]
+    book.seed(np.random.default_rng(0))
+    for _ in range(4 * depth):
+        book.process_quote(book.generate_quote(0))
+    return book
+
+def quoted_market(n_books: int, iterations: int, **params) -> Market:
+    """A seeded Market over n_books standard outrights."""
+    books = make_books(n_books, iterations, **params)
+    return Market(books, Trader(books, name='bench'), iterations, seed=0)
+
+@benchmark("book.process_quote", depth=(5, 50, 500), max_qty=(1, 10))
+def bench_process_quote(depth: int, max_qty: int):
+    n = 20000
+    book = filled_book(depth, n, max_qty)
+    quotes = [book.generate_quote(i) for i in range(n)]
+
+    def run():
+        for q in quotes:
+            book.process_quote(q)
+    return run, n
+
+@benchmark("book.get_best", depth=(5, 50))
+def bench_get_best(depth: int):
+    n = 50000
+    book = filled_book(depth, n)
+
+    def run():
+        for _ in range(n):
+            book.get_best_bid()
+            book.get_best_offer()
+    return run, n
+
+@benchmark("book.clean", depth=(5, 50))
+def bench_clean(depth: int):
+    """Resting a bid below the book then clean() dropping the worst level again."""
+    n = 20000
+    book = filled_book(depth, n)
+    prices = (np.round(book.theo) - 60 - np.arange(n) % 10).tolist()
+
+    def run():
+        for p in prices:
+            book.bids.append(p)
+            book.clean()
+    return run, n
+
+@benchmark("book.process_action", depth=(5, 50))
+def bench_process_action(depth: int):
+    """A hit or lift against the top of book, after resting a quote it can trade with."""
+    n = 20000
+    book = filled_book(depth, n)
+    theo = round(book.theo)
+    ops = [(Bid, theo - 5, 'h') if k % 2 else (Offer, theo + 5, 'l') for k in range(n)]
+
+    def run():
+        for side, price, action in ops:
+            book.rest(price, side)
+            book.process_action(action)
+    return run, n
+
+@benchmark("book.orders", cancel_ratio=(0.5, 0.9))
+def bench_orders(cancel_ratio: float):
+    """User limit orders submitted and cancelled among bot quotes at depth 50.
+    One op is a submit or cancel followed by a bot quote.
+    """
+    n = 20000
+    book = filled_book(50, n)
+    trader = Trader([book], name='bench')
+    rng = np.random.default_rng(0)
+    theo = round(book.theo)
+    sides = rng.choice([Bid, Offer], n).tolist()
+    prices = [theo - side * offset for side, offset in zip(sides, rng.integers(5, 40, n).tolist())]
+    cancels = (rng.random(n) < cancel_ratio).tolist()
+    quotes = [book.generate_quote(0) for _ in range(n)]
+
+    def run():
+        resting = []
+        for side, price, cancel, q in zip(sides, prices, cancels, quotes):
+            if cancel and resting:
+                book.cancel(resting.pop())
+            else:
+                order, _ = book.submit(side, price, 1, trader)
+                if order is not None:
+                    resting.append(order.id)
+            book.process_quote(q)
+        for order_id in resting:
+            book.cancel(order_id)
+    return run, n
+
+class DictQuote:
+    """A dict-backed copy of Quote, standing in for the pre-__slots__ class."""
+    def __init__(self, price, side, book_name, qty=1):
+        self.book_name = book_name
+        self.price = round(price)
+        self.side = side
+        self.qty = qty
+
+@benchmark("quotes", kind=("dict", "slots", "batch"))
+def bench_quotes(kind: str):
+    """Building and processing unit quotes as DictQuotes, Quotes or one QUOTE_DTYPE batch.
+    Records the memory and allocations per quote alongside.
+    """
+    n = 100000
+    rng = np.random.default_rng(0)
+    prices = rng.normal(175, 25, n)
+    sides = np.where(rng.random(n) < 0.5, Bid, Offer)
+    price_list, side_list = prices.tolist(), sides.tolist()
+    build = {"dict": lambda: [DictQuote(p, s, 'Future A') for p, s in zip(price_list, side_list)],
+             "slots": lambda: [Quote(p, s, 'Future A') for p, s in zip(price_list, side_list)],
+             "batch": lambda: quote_batch(0, prices, sides)}[kind]
+
+    tracemalloc.start()
+    quotes = build()
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del quotes
+    book = make_books(1, 1)[0]
+
+    def run():
+        quotes = build()
+        if kind == "batch":
+            book.process_quote(quotes)
+        else:
+            for q in quotes:
+                book.process_quote(q)
+    return run, n, {"bytes_per_quote": current / n, "peak_bytes": peak, "blocks": blocks}
+
+@benchmark("bots", path=("generate_quote", "market", "vectorised"), n_books=(1, 10, 100))
+def bench_bots(path: str, n_books: int):
+    """Every book quoting every iteration: per-book generate_quote, a NoisyTheoBot through
+    Market.bot_quotes, or a NoisyTheoBot through monte_carlo.bot_step across 1000
+    sessions. One op is one quote. Within one Market a Bot's batch is only the books
+    quoting that iteration, so NumPy's per-call overhead dominates at few books;
+    across sessions a batch holds every session and batching pays.
+    """
+    from bots import NoisyTheoBot
+    from monte_carlo import bot_step, draw_sessions
+
+    if path != "vectorised":
+        n = 200
+        market = quoted_market(n_books, n, bots=None if path == "generate_quote" else [NoisyTheoBot()])
+        books, idx = market.books, list(range(n_books))
+
+        def run():
+            for i in range(n):
+                if path == "generate_quote":
+                    for b in books:
+                        b.process_quote(b.generate_quote(i))
+                else:
+                    market.process_quotes(market.bot_quotes(idx, i))
+        return run, n * n_books
+
+    n_sessions, n = 1000, 20
+    books = make_books(n_books, n, bots=[NoisyTheoBot(np.random.default_rng(0))])
+    draws = draw_sessions(books, n_sessions, n, rng=np.random.default_rng(0))
+    draws["quoting"][:] = True
+    bids = [np.full((n_sessions, b.depth + 1), -np.inf) for b in books]
+    offers = [np.full((n_sessions, b.depth + 1), np.inf) for b in books]
+    best_bid = np.full((n_sessions, n_books), -np.inf)
+    best_offer = np.full((n_sessions, n_books), np.inf)
+    position = np.zeros((n_sessions, n_books), dtype=np.int64)
+    prev_mid = np.full((n_sessions, n_books), np.nan)
+
+    def run():
+        for i in range(n):
+            bot_step(books, draws, i, bids, offers, best_bid, best_offer, position, prev_mid)
+    return run, n_sessions * n * n_books
+
+@benchmark("option_chain", impl=("chain", "scalar"))
+def bench_option_chain(impl: str):
+    """Repricing calls and puts on 50 strikes of each of 5 underlyings, through
+    OptionChain.reprice or each option's calc_option_theo. One op is one option.
+    """
+    options = []
+    for u in make_books(5):
+        options += OptionChain.listed(u, range(100, 250, 3), verbose=False).options
+    chain = OptionChain(options)
+    repeats = 100 if impl == "chain" else 1
+
+    def run():
+        if impl == "chain":
+            for _ in range(repeats):
+                chain.reprice()
+        else:
+            for o in options:
+                o.calc_option_theo()
+    return run, repeats * len(options)
+
+@benchmark("combo_chain", n_spreads=(50, 500))
+def bench_combo_chain(n_spreads: int):
+    """ComboChain.reprice and implied_prices for two-leg spreads over 50 quoted outrights.
+    One op is one spread priced.
+    """
+    outrights = make_books(50)
+    for b in outrights:
+        b.seed(np.random.default_rng(0))
+        for i in range(10):
+            b.process_quote(b.generate_quote(i))
+    rng = np.random.default_rng(0)
+    pairs = [rng.choice(len(outrights), 2, replace=False) for _ in range(n_spreads)]
+    chain = ComboChain([Spread([(outrights[a], 1), (outrights[b], -1)], verbose=False) for a, b in pairs])
+    repeats = 100
+
+    def run():
+        for _ in range(repeats):
+            chain.reprice()
+            chain.implied_prices()
+    return run, repeats * n_spreads
+
+@benchmark("calc_n_quotes", size=(None, 256))
+def bench_calc_n_quotes(size: int):
+    n = 20000 if size is None else 200
+    rng = np.random.default_rng(0)
+
+    def run():
+        for _ in range(n):
+            calc_n_quotes(10, rng=rng, size=size)
+    return run, n if size is None else n * size
+
+@benchmark("session", n_books=(2, 10, 100), iterations=(1000, 10000, 100000, 1000000))
+def bench_session(n_books: int, iterations: int):
+    """A headless Market.run without a strategy. One op is one iteration."""
+    def run():
+        quoted_market(n_books, iterations).run()
+    return run, iterations
+
+@benchmark("monte_carlo.sessions", impl=("vectorised", "market_run"))
+def bench_sessions(impl: str):
+    """Two-book, 20-iteration sessions under edge_policy, all at once through
+    simulate_sessions or one by one through Market.run. One op is one session.
+    """
+    from monte_carlo import as_strategy, edge_policy, simulate_sessions
+
+    policy = edge_policy()
+    if impl == "vectorised":
+        n = 10000
+
+        def run():
+            simulate_sessions(make_books(2), n, 20, policy, seed=0)
+        return run, n
+
+    n, strategy = 200, as_strategy(policy)
+
+    def run():
+        for seed in range(n):
+            books = make_books(2)
+            Market(books, Trader(books, name='bench'), 20, seed=seed).run(strategy)
+    return run, n
+
+@benchmark("farm", workers=tuple(sorted({1, os.cpu_count() or 1})))
+def bench_farm(workers: int):
+    """run_farm over 2000 sessions of the default config, eight shards per worker.
+    One op is one session; divide by workers against workers=1 for the scaling efficiency.
+    """
+    from farm import default_config, run_farm
+
+    n = 2000
+    config = default_config()
+
+    def run():
+        run_farm(config, n, workers=workers, shard_size=max(n // (8 * workers), 1))
+    return run, n
+
+@benchmark("paths", impl=("vectorised", "loop"))
+def bench_paths(impl: str):
+    """Correlated theo paths for 10 books over 1000 iterations, through theo_paths for
+    1000 sessions or stepped in a Python loop for 10. One op is one book step.
+    """
+    from paths import theo_paths
+
+    n_books, iterations = 10, 1000
+    rng = np.random.default_rng(0)
+    corr = np.full((n_books, n_books), 0.5) + 0.5 * np.eye(n_books)
+    if impl == "vectorised":
+        n_sessions = 1000
+
+        def run():
+            theo_paths(np.full(n_books, 175.0), iterations, 5.0, corr, jump_prob=0.01, jump_std=20,
+                       n_sessions=n_sessions, rng=rng)
+        return run, n_sessions * iterations * n_books
+
+    n_sessions, chol = 10, np.linalg.cholesky(corr)
+
+    def run():
+        for _ in range(n_sessions):
+            theo = [175.0] * n_books
+            for _ in range(iterations):
+                z = chol @ rng.standard_normal(n_books)
+                theo = [t + 5.0 * dz for t, dz in zip(theo, z.tolist())]
+    return run, n_sessions * iterations * n_books
+
+@benchmark("scheduler", n_books=(2, 10, 100))
+def bench_scheduler(n_books: int):
+    """A Simulation with one edge_policy trader acting once per unit of simulated time.
+    One op is one event; compare with session for Market.run.
+    """
+    from monte_carlo import as_strategy, edge_policy
+    from scheduler import FixedProcess, Simulation
+
+    n = 100000
+    strategy = as_strategy(edge_policy())
+
+    def run():
+        market = quoted_market(n_books, n // n_books)
+        Simulation(market, traders=[(strategy, FixedProcess(1))]).run(max_events=n)
+    return run, n
+
+@benchmark("render.ladder", n_books=(2, 10, 50, 100))
+def bench_ladder(n_books: int):
+    """LadderRenderer.render after each iteration's quotes. Only the render is timed."""
+    n = 2000
+    market = quoted_market(n_books, n)
+    renderer = LadderRenderer(market.books, stream=io.StringIO())
+    renderer.open()
+
+    def run():
+        elapsed = 0
+        for i in range(n):
+            market.generate_quotes(i)
+            start = time.perf_counter_ns()
+            renderer.render()
+            elapsed += time.perf_counter_ns() - start
+        return elapsed
+    return run, n
+
+@benchmark("render.display_books", n_books=(2, 10))
+def bench_display_books(n_books: int):
+    """display_books after each iteration's quotes. Only the display is timed, and not
+    the first call, which imports pandas.
+    """
+    n = 50
+    market = quoted_market(n_books, n)
+    with contextlib.redirect_stdout(io.StringIO()):
+        display_books(market.books)
+
+    def run():
+        elapsed = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(n):
+                market.generate_quotes(i)
+                start = time.perf_counter_ns()
+                display_books(market.books)
+                elapsed += time.perf_counter_ns() - start
+        return elapsed
+    return run, n
+
+@benchmark("env.step", n_envs=(1, 100, 1000, 10000))
+def bench_env_step(n_envs: int):
+    """MarketEnv for a single env, VecMarketEnv otherwise. One op is one env step."""
+    from env import MarketEnv, VecMarketEnv
+
+    n_calls = 2000 if n_envs == 1 else max(100000 // n_envs, 20)
+    env = MarketEnv() if n_envs == 1 else VecMarketEnv(n_envs)
+    actions = np.random.default_rng(0).integers(-1, 2, (n_calls,) + ((n_envs,) if n_envs > 1 else ()) + (env.n_books,))
+
+    def run():
+        env.reset(seed=0)
+        for k in range(n_calls):
+            if np.all(env.step(actions[k])[2]):
+                env.reset(seed=k)
+    return run, n_calls * n_envs
+
+@benchmark("risk", impl=("evaluate", "full"), n_options=(0, 10), moves=(2, 50))
+def bench_risk(impl: str, n_options: int, moves: int):
+    """Revaluing 100k scenarios over 50 books after each tick's two fills and theo moves
+    of `moves` random outrights (all of them at 50 - n_options, as under theo paths),
+    through RiskEngine.evaluate or from scratch over the full scenario matrix. Only the
+    revaluation is timed. One op is one tick.
+    """
+    from risk import RiskEngine
+
+    n, n_scenarios = 50, 100000
+    rng = np.random.default_rng(0)
+    outrights = make_books(50 - n_options, n)
+    books = outrights + [Call(outrights[k], 175, verbose=False) for k in range(n_options)]
+    trader = Trader(books, name='bench')
+    engine = RiskEngine(trader, n_scenarios, rng=rng)
+    engine.evaluate()
+    labels = [b.label for b in books]
+
+    def revalue():
+        if impl == "evaluate":
+            return engine.evaluate()
+        theos = engine.theos()
+        full = sum(v['cash'] + v['position'] * engine.settle(v['book'], theos) for v in trader.log.values())
+        return np.partition(full, int(0.01 * n_scenarios))
+
+    def run():
+        elapsed = 0
+        for _ in range(n):
+            for k in rng.permutation(len(outrights))[:moves].tolist():
+                outrights[k].theo += rng.normal(0, 1)
+            for k in rng.integers(len(books), size=2).tolist():
+                side = 1 if rng.random() < 0.5 else -1
+                trader.process_action(side * round(books[k].theo), labels[k], side)
+            start = time.perf_counter_ns()
+            revalue()
+            elapsed += time.perf_counter_ns() - start
+        return elapsed
+    return run, n
+
+def synthetic_shard(rng: np.random.Generator, n: int, n_books: int = 2) -> dict:
+    """Random session summaries shaped like a farm shard."""
+    return {
+        "seed": rng.integers(0, 2 ** 63, n, dtype=np.uint64),
+        "pnl": rng.normal(0, 200, n),
+        "book_pnl": rng.normal(0, 150, (n, n_books)),
+        "position": rng.integers(-10, 11, (n, n_books)),
+        "fills": rng.integers(0, 20, (n, n_books)),
+        "settlement": rng.normal(175, 40, (n, n_books)),
+        "theo": rng.uniform(100, 250, (n, n_books)),
+    }
+
+STORE_CONFIGS = ({"iterations": 20, "books": book_kwargs(2)}, {"iterations": 50, "books": book_kwargs(2)})
+
+@functools.lru_cache(maxsize=None)
+def filled_store(n_sessions: int, n_players: int = 1000):
+    """A ResultsStore holding n_sessions synthetic sessions, built once per size, under
+    the two STORE_CONFIGS in turn by shard. Each session is played by one of n_players
+    drawn uniformly, at a random time over the past year.
+    """
+    from store import ResultsStore
+
+    rng = np.random.default_rng(0)
+    tmp = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmp, True)
+    store = ResultsStore(os.path.join(tmp, 'results.db'))
+    end, chunk = time.time(), 10000
+    for k in range(0, n_sessions, chunk):
+        n = min(chunk, n_sessions - k)
+        shard = synthetic_shard(rng, n)
+        shard["created"] = end - rng.uniform(0, 365 * 86400, n)
+        players = rng.integers(n_players, size=n)
+        # Group the shard by player, as add_shard takes one player per call
+        order = np.argsort(players, kind='stable')
+        starts = np.flatnonzero(np.diff(players[order], prepend=-1))
+        for rows in np.split(order, starts[1:]):
+            part = {key: v[rows] for key, v in shard.items()}
+            store.add_shard(STORE_CONFIGS[k // chunk % 2], part, f'player {players[rows[0]]}',
+                            created=part.pop("created"))
+    store.flush()
+    return store, end
+
+@benchmark("store.ingest", mode=("batched", "rowwise"))
+def bench_store_ingest(mode: str):
+    """Adding two-book session summaries to a new ResultsStore file, as 10000-session
+    shards or committed one session at a time. One op is one session.
+    """
+    from store import ResultsStore
+
+    n = 100000 if mode == "batched" else 2000
+    rng = np.random.default_rng(0)
+    config, labels = STORE_CONFIGS[0], [kw["label"] for kw in STORE_CONFIGS[0]["books"]]
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            if mode == "batched":
+                with ResultsStore(os.path.join(tmp, 'results.db')) as store:
+                    for k in range(0, n, 10000):
+                        store.add_shard(config, synthetic_shard(rng, 10000), 'player 0')
+                return
+            rows = synthetic_shard(rng, n)
+            with ResultsStore(os.path.join(tmp, 'rowwise.db'), batch_size=1) as store:
+                for k in range(n):
+                    store.add('player 0', config, int(rows["seed"][k]), rows["pnl"][k],
+                              list(zip(labels, rows["position"][k], rows["fills"][k], [None] * len(labels),
+                                       rows["settlement"][k], rows["theo"][k], rows["book_pnl"][k])))
+    return run, n
+
+@benchmark("store.query", query=("top", "top_player", "top_config", "top_week", "history", "leaderboard"),
+           n_sessions=(100000, 1000000))
+def bench_store_query(query: str, n_sessions: int):
+    """Top-10, leaderboard and history queries against a filled_store. One op is one query."""
+    store, end = filled_store(n_sessions)
+    query = {
+        "top": lambda: store.top(10),
+        "top_player": lambda: store.top(10, player='player 7'),
+        "top_config": lambda: store.top(10, config=STORE_CONFIGS[1]),
+        "top_week": lambda: store.top(10, since=end - 7 * 86400),
+        "history": lambda: store.history('player 7'),
+        "leaderboard": lambda: store.leaderboard(10),
+    }[query]
+    n = 5
+
+    def run():
+        for _ in range(n):
+            query()
+    return run, n
+
+def time_benchmark(func, params: dict, repeat: int) -> dict:
+    """Times a registered benchmark. The first run warms up (imports included) and is discarded."""
+    run, n_ops, *extra = func(**params)
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        elapsed = run()
+        times.append(time.perf_counter_ns() - start if elapsed is None else elapsed)
+    per_op = [t / n_ops for t in times]
+    return {"params": params, "n_ops": n_ops, "repeat": repeat,
+            "ns_per_op_min": min(per_op), "ns_per_op_median": statistics.median(per_op),
+            "ops_per_s": 1e9 / min(per_op), **(extra[0] if extra else {})}
+
+def import_time(module: str, repeat: int) -> dict:
+    """Cumulative import time of module in a fresh interpreter, from python -X importtime."""
+    times, n_modules = [], 0
+    for _ in range(repeat):
+        err = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+        # Lines read "import time: self [us] | cumulative | imported package"
+        rows = [line.split('|') for line in err.splitlines() if line.startswith('import time:')]
+        n_modules = len(rows) - 1
+        times.extend(int(cumulative) * 1000 for _, cumulative, name in rows[1:] if name.strip() == module)
+    return {"params": {"module": module}, "n_ops": 1, "repeat": repeat, "modules": n_modules,
+            "ns_per_op_min": min(times), "ns_per_op_median": statistics.median(times),
+            "ops_per_s": 1e9 / min(times)}
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "commit": commit or None,
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Prints per-benchmark ratios against a baseline and returns the regressed names."""
+    regressed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = r["ns_per_op_min"] / base["ns_per_op_min"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:<60}{ratio:>8.2f}x{flag}")
+    return regressed
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help="Write results as JSON to this file.")
+    parser.add_argument('-k', '--filter', default="", help="Only run benchmarks whose name contains this.")
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--max-iterations', type=float, default=1e5,
+                        help="Skip sessions longer than this many iterations.")
+    parser.add_argument('--max-sessions', type=float, default=1e5,
+                        help="Skip store queries on more sessions than this.")
+    parser.add_argument('--compare', help="Baseline JSON to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Slowdown ratio above which a benchmark counts as regressed.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in IMPORTS:
+        name = f"import[module={module}]"
+        if args.filter in name:
+            res = results[name] = import_time(module, max(args.repeat, 5))
+            print(f"{name:<60}{res['ns_per_op_min'] / 1e6:>12.1f} ms{res['modules']:>14} modules")
+    for name, (func, params) in BENCHMARKS.items():
+        if (args.filter not in name or params.get("iterations", 0) > args.max_iterations
+                or params.get("n_sessions", 0) > args.max_sessions):
+            continue
+        # Long sessions are only run once
+        repeat = 1 if params.get("iterations", 0) * params.get("n_books", 1) >= 1e6 else args.repeat
+        res = results[name] = time_benchmark(func, params, repeat)
+        print(f"{name:<60}{res['ns_per_op_min']:>12.0f} ns/op{res['ops_per_s']:>14.0f} ops/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+# Sides follow mock_bot: 1 is a bid, -1 an offer
+Bid = 1
+Offer = -1
+
+class Bot(ABC):
+    """A quoting strategy for one or more books.
+
+    quote() is batched: every field of the state dict is an (N,) array with one
+    row per book (or per session), so a vectorised bot quotes all of them in one
+    call. State fields are 'theo', 'std' (the decayed quote noise), 'cross_prob',
+    'max_qty', 'best_bid' and 'best_offer' (nan when a side is empty), 'mid' and
+    'prev_mid' (the mid when the book last quoted, nan if unknown) and 'inventory',
+    the bots' net position in the book from trading with the user.
+    """
+    def __init__(self, rng: np.random.Generator = None) -> None:
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def seed(self, rng: np.random.Generator) -> None:
+        """Gives the bot a new Generator."""
+        self.rng = rng
+
+    @abstractmethod
+    def quote(self, state: dict, i: int) -> tuple:
+        """Quotes for iteration i.
+        Args:
+            state (dict): (N,) arrays describing each row's book, see the class docstring.
+            i (int): Iteration.
+        Returns:
+            tuple: (row, price, side, qty) arrays, one entry per quote. A bot may
+                quote any number of times per row, including not at all.
+        """
+
+class NoisyTheoBot(Bot):
+    """The classic bot: a normal draw around theo, on the side away from theo
+    unless it crosses itself with probability cross_prob.
+    """
+    def quote(self, state: dict, i: int) -> tuple:
+        theo = state["theo"]
+        n = len(theo)
+        price = theo + state["std"] * self.rng.standard_normal(n)
+        cross = self.rng.random(n) < state["cross_prob"]
+        side = np.where((price < theo) != cross, Bid, Offer)
+        qty = 1 + (self.rng.random(n) * state["max_qty"]).astype(np.int64)
+        return np.arange(n), price, side, qty
+
+class InventoryMarketMaker(Bot):
+    """Quotes both sides around a noisy fair value, skewing both quotes against its
+    inventory so that it leans towards flattening.
+    Args:
+        spread (float): Distance between its bid and offer.
+        skew (float): Price shift per unit of inventory.
+        noise (float): Fair value noise as a fraction of the book's std.
+        qty (int): Size of each quote.
+    """
+    def __init__(self, spread: float = 4, skew: float = 0.5, noise: float = 0.5, qty: int = 1,
+                 rng: np.random.Generator = None) -> None:
+        super().__init__(rng)
+        self.spread = spread
+        self.skew = skew
+        self.noise = noise
+        self.qty = qty
+
+    def quote(self, state: dict, i: int) -> tuple:
+        theo = state["theo"]
+        n = len(theo)
+        fair = theo + self.noise * state["std"] * self.rng.standard_normal(n) - self.skew * state["inventory"]
+        row = np.arange(n)
+        price = np.concatenate([fair - self.spread / 2, fair + self.spread / 2])
+        side = np.repeat([Bid, Offer], n)
+        return np.concatenate([row, row]), price, side, np.full(2 * n, self.qty)
+
+class MomentumTaker(Bot):
+    """Takes the top of book in the direction the mid moved since the book last quoted.
+    Args:
+        threshold (float): Minimum mid move to trade on.
+        qty (int): Size taken per trade.
+    """
+    def __init__(self, threshold: float = 2, qty: int = 1, rng: np.random.Generator = None) -> None:
+        super().__init__(rng)
+        self.threshold = threshold
+        self.qty = qty
+
+    def quote(self, state: dict, i: int) -> tuple:
+        move = state["mid"] - state["prev_mid"]
+        # nan moves and empty sides compare False, so they never trade
+        up = (move > self.threshold) & ~np.isnan(state["best_offer"])
+        down = (move < -self.threshold) & ~np.isnan(state["best_bid"])
+        row = np.concatenate([np.flatnonzero(up), np.flatnonzero(down)])
+        # Bot quotes match strictly through their price, so cross by a tick
+        price = np.concatenate([state["best_offer"][up] + 1, state["best_bid"][down] - 1])
+        side = np.repeat([Bid, Offer], [up.sum(), down.sum()])
+        return row, price, side, np.full(len(row), self.qty)
@@ -0,0 +1,162 @@
+import numpy as np
+from mock_bot import Book, Market, Trader, book_kwargs
+from monte_carlo import action_step, bot_step, draw_sessions, quote_step, seed_bots
+
+def default_books(n_books: int = 2) -> list[dict]:
+    """Book kwargs for an environment's books."""
+    return book_kwargs(n_books)
+
+class MarketEnv:
+    """Gymnasium-style environment over one Market session.
+
+    An action is one integer per book: -n hits n, 0 does nothing and n lifts n.
+    reset() quotes iteration 0; each step applies the actions through
+    Book.process_action and then quotes the next iteration, so a session is the
+    same as Market.run with the policy as its strategy.
+
+    Observations hold the top n_levels price levels of each side as (B, n_levels)
+    'bids'/'bid_qty'/'offers'/'offer_qty' arrays (nan/0 padded), 'position' (B,)
+    and 'iteration'. Rewards are the change in cash plus position marked at theo,
+    marked at settlement on the last step, so they sum to the session's PnL.
+    """
+    def __init__(self, books: list[dict] = None, iterations: int = 20, n_levels: int = 5) -> None:
+        self.book_kwargs = books or default_books()
+        self.iterations = iterations
+        self.n_levels = n_levels
+        self.n_books = len(self.book_kwargs)
+        self.market = None
+
+    def reset(self, seed: int = None) -> tuple[dict, dict]:
+        """Builds fresh books for a new session. Returns (observation, info)."""
+        books = [Book(iterations=self.iterations, verbose=False, **kw) for kw in self.book_kwargs]
+        self.books = books
+        self.trader = Trader(books, name='agent')
+        self.market = Market(books, self.trader, self.iterations, seed=seed)
+        self.iteration = 0
+        self.value = 0.0
+        self.market.generate_quotes(0)
+        return self.observe(), {}
+
+    def observe(self) -> dict:
+        n = self.n_levels
+        obs = {
+            "bids": np.full((self.n_books, n), np.nan), "bid_qty": np.zeros((self.n_books, n), dtype=np.int64),
+            "offers": np.full((self.n_books, n), np.nan), "offer_qty": np.zeros((self.n_books, n), dtype=np.int64),
+            "position": np.array([self.trader.log[b.label]["position"] for b in self.books]),
+            "iteration": self.iteration,
+        }
+        for j, b in enumerate(self.books):
+            for side, levels in (("bid", b.bids), ("offer", b.offers)):
+                ladder = levels.ladder(n)
+                if ladder:
+                    prices, qtys = zip(*ladder)
+                    obs[side + "s"][j, :len(ladder)] = prices
+                    obs[side + "_qty"][j, :len(ladder)] = qtys
+        return obs
+
+    def mark(self, terminal: bool) -> float:
+        """Cash plus position marked at theo, or at settlement once the session is over."""
+        value = 0.0
+        for b in self.books:
+            log = self.trader.log[b.label]
+            value += log["cash"] + log["position"] * (b.settlement if terminal else b.theo)
+        return value
+
+    def step(self, actions) -> tuple[dict, float, bool, bool, dict]:
+        """Applies one action per book and advances an iteration.
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info). info holds
+                'fills', the number of books that traded.
+        """
+        if self.market is None or self.iteration >= self.iterations:
+            raise RuntimeError("call reset() before stepping a new session")
+        orders = [('l' if a > 0 else 'h') + (str(abs(a)) if abs(a) > 1 else '') + b.label
+                  for a, b in zip(np.asarray(actions, dtype=np.int64).tolist(), self.books) if a]
+        fills = self.market.process_actions(orders)
+
+        self.iteration += 1
+        terminated = self.iteration >= self.iterations
+        if not terminated:
+            self.market.generate_quotes(self.iteration)
+        value = self.mark(terminated)
+        reward, self.value = value - self.value, value
+        return self.observe(), reward, terminated, False, {"fills": fills}
+
+class VecMarketEnv:
+    """n_envs independent sessions stepped together on monte_carlo's vectorised
+    book model, with the same action, observation and reward conventions as
+    MarketEnv batched along a leading env axis. Quotes and actions are unit size,
+    and observed levels are per resting order, so a price can repeat with qty 1.
+    All envs run in lockstep, so they terminate together and reset together.
+    """
+    def __init__(self, n_envs: int, books: list[dict] = None, iterations: int = 20,
+                 n_levels: int = 5, depth: int = 5) -> None:
+        self.n_envs = n_envs
+        self.iterations = iterations
+        self.n_levels = n_levels
+        self.templates = [Book(iterations=iterations, depth=depth, verbose=False, **kw)
+                          for kw in books or default_books()]
+        self.n_books = len(self.templates)
+        self.draws = None
+
+    def reset(self, seed: int = None) -> tuple[dict, dict]:
+        """Draws every env's session up front and quotes iteration 0. Returns (observation, info)."""
+        n, n_books = self.n_envs, self.n_books
+        rng = np.random.default_rng(seed)
+        self.draws = draw_sessions(self.templates, n, self.iterations, rng=rng)
+        seed_bots(self.templates, rng)
+        self.bids = [np.full((n, b.depth + 1), -np.inf) for b in self.templates]
+        self.offers = [np.full((n, b.depth + 1), np.inf) for b in self.templates]
+        self.position = np.zeros((n, n_books), dtype=np.int64)
+        self.cash = np.zeros((n, n_books))
+        self.fills = np.zeros((n, n_books), dtype=np.int64)
+        self.best_bid = np.full((n, n_books), -np.inf)
+        self.best_offer = np.full((n, n_books), np.inf)
+        self.prev_mid = np.full((n, n_books), np.nan)
+        self.value = np.zeros(n)
+        self.iteration = 0
+        self.quote(0)
+        return self.observe(), {}
+
+    def quote(self, i: int) -> None:
+        quote_step(self.draws, i, self.bids, self.offers, self.best_bid, self.best_offer)
+        bot_step(self.templates, self.draws, i, self.bids, self.offers, self.best_bid, self.best_offer,
+                 self.position, self.prev_mid)
+
+    def observe(self) -> dict:
+        """Observations as (N, B, n_levels) level arrays plus (N, B) positions."""
+        n = self.n_levels
+        obs = {}
+        for side, levels, sign, empty in (("bid", self.bids, -1, -np.inf), ("offer", self.offers, 1, np.inf)):
+            # Best first: sort bids descending and offers ascending, one slot per unit order
+            stacked = np.sort(sign * np.stack(levels, axis=1), axis=-1)[..., :n] * sign
+            width = stacked.shape[-1]
+            if width < n:
+                stacked = np.concatenate([stacked, np.full(stacked.shape[:-1] + (n - width,), empty)], axis=-1)
+            filled = np.isfinite(stacked)
+            obs[side + "s"] = np.where(filled, stacked, np.nan)
+            obs[side + "_qty"] = filled.astype(np.int64)
+        obs["position"] = self.position.copy()
+        obs["iteration"] = self.iteration
+        return obs
+
+    def step(self, actions: np.ndarray) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Applies (N, B) actions (sign only: -1 hit, 0 nothing, 1 lift) and advances
+        every env an iteration. Returns batched (observation, reward, terminated, truncated, info).
+        """
+        if self.draws is None or self.iteration >= self.iterations:
+            raise RuntimeError("call reset() before stepping a new session")
+        fills = self.fills.copy()
+        action_step(np.asarray(actions), self.bids, self.offers, self.best_bid, self.best_offer,
+                    self.position, self.cash, self.fills)
+
+        self.iteration += 1
+        terminated = self.iteration >= self.iterations
+        if not terminated:
+            self.quote(self.iteration)
+        mark = self.draws["settlement"] if terminated else self.draws["theo"]
+        value = (self.cash + self.position * mark).sum(axis=1)
+        reward, self.value = value - self.value, value
+        done = np.full(self.n_envs, terminated)
+        return (self.observe(), reward, done, np.zeros(self.n_envs, dtype=bool),
+                {"fills": (self.fills - fills).sum(axis=1)})
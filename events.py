@@ -0,0 +1,123 @@
+import os
+import time
+from enum import IntEnum
+from typing import NamedTuple
+import numpy as np
+
+class EventType(IntEnum):
+    QUOTE = 0   # a quote rests in the book
+    CANCEL = 1  # Book.clean removed the worst quote
+    HIT = 2     # a bot offer hit the best bid
+    LIFT = 3    # a bot bid lifted the best offer
+    FILL = 4    # the user traded; side is Buy or Sell
+    ORDER = 5   # a user limit order rests in the book, or was reduced
+
+class Event(NamedTuple):
+    iteration: int
+    timestamp: int  # time.monotonic_ns()
+    book: str
+    side: int
+    price: float
+    type: EventType
+    qty: int = 1
+
+class NullSink:
+    """Discards events. A bus holding only null sinks does not build events at all."""
+    def write(self, event: Event) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class ConsoleSink:
+    """Prints events in the market's usual console format."""
+    def write(self, event: Event) -> None:
+        book, side, price = event.book, event.side, event.price
+        side_name = "Bid" if side == 1 else "Offer"
+        size = f"{event.qty} @ " if event.qty != 1 else ""
+        if event.type == EventType.QUOTE:
+            print(f"{book}: {side_name} {size}{price}")
+        elif event.type == EventType.CANCEL:
+            print(f"{book}: Removed {size}{price} {side_name}")
+        elif event.type in (EventType.HIT, EventType.LIFT):
+            print(f"{book}: {size}{price} {side_name} {'Hit' if event.type == EventType.HIT else 'Lifted'}")
+        elif event.type == EventType.ORDER:
+            print(f"{book}: Working {side_name} {size}{price}")
+        elif event.type == EventType.FILL:
+            print(f"{book}: {'Bought' if side == 1 else 'Sold'} {size or '@ '}{price}!")
+
+    def close(self) -> None:
+        pass
+
+class BinaryFileSink:
+    """Buffers events and appends them to a file as blocks of columns.
+
+    Each flush writes one np.save array per Event field, so a journal is a
+    sequence of column blocks that read_journal stitches back together.
+    """
+    def __init__(self, path: str, buffer_size: int = 65536) -> None:
+        self.file = open(path, 'wb')
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def write(self, event: Event) -> None:
+        self.buffer.append(event)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        iteration, timestamp, book, side, price, type_, qty = zip(*self.buffer)
+        np.save(self.file, np.array(iteration, dtype=np.int64))
+        np.save(self.file, np.array(timestamp, dtype=np.int64))
+        np.save(self.file, np.array(book, dtype=str))
+        np.save(self.file, np.array(side, dtype=np.int8))
+        np.save(self.file, np.array(price, dtype=np.float64))
+        np.save(self.file, np.array(type_, dtype=np.uint8))
+        np.save(self.file, np.array(qty, dtype=np.int64))
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+def read_journal(path: str) -> dict:
+    """Reads a BinaryFileSink journal into one array per Event field."""
+    blocks = {k: [] for k in Event._fields}
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while f.tell() < size:
+            for k in Event._fields:
+                blocks[k].append(np.load(f))
+    return {k: np.concatenate(v) if v else np.empty(0) for k, v in blocks.items()}
+
+class EventBus:
+    """Routes typed market events to sinks, stamped with iteration and time."""
+    def __init__(self, sinks: list = None) -> None:
+        self.iteration = 0
+        self.sinks = []
+        self._live = []
+        for sink in sinks or []:
+            self.add_sink(sink)
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+        self._live = [s for s in self.sinks if not isinstance(s, NullSink)]
+
+    def remove_sink(self, sink) -> None:
+        self.sinks.remove(sink)
+        self._live = [s for s in self.sinks if not isinstance(s, NullSink)]
+
+    def emit(self, type_: EventType, book: str, side: int, price: float, qty: int = 1) -> None:
+        """Publishes an event to every sink."""
+        if not self._live:
+            return
+        event = Event(self.iteration, time.monotonic_ns(), book, side, price, type_, qty)
+        for sink in self._live:
+            sink.write(event)
+
+    def close(self) -> None:
+        """Flushes and closes every sink."""
+        for sink in self.sinks:
+            sink.close()
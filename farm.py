@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from mock_bot import Book, Market, Trader, book_kwargs
+from monte_carlo import as_strategy, edge_policy
+
+def default_config(iterations: int = 20, n_books: int = 2) -> dict:
+    """A picklable session config: Book kwargs, iteration count and a scripted strategy."""
+    return {
+        "iterations": iterations,
+        "books": book_kwargs(n_books),
+        "strategy": as_strategy(edge_policy()),
+    }
+
+def run_shard(config: dict, seeds: list[int]) -> dict:
+    """Runs one session per seed and returns compact per-session arrays.
+    Returns:
+        dict: 'seed' (n,), 'pnl' (n,) and per-book 'book_pnl', 'position', 'fills'
+            (units traded), 'settlement' and final 'theo' (n, B).
+    """
+    iterations = config["iterations"]
+    n, n_books = len(seeds), len(config["books"])
+    res = {
+        "seed": np.asarray(seeds, dtype=np.uint64),
+        "pnl": np.zeros(n),
+        "book_pnl": np.zeros((n, n_books)),
+        "position": np.zeros((n, n_books), dtype=np.int64),
+        "fills": np.zeros((n, n_books), dtype=np.int64),
+        "settlement": np.zeros((n, n_books)),
+        "theo": np.zeros((n, n_books)),
+    }
+    for k, seed in enumerate(seeds):
+        books = [Book(iterations=iterations, verbose=False, **kw) for kw in config["books"]]
+        trader = Trader(books, name=f'session {seed}')
+        res["pnl"][k] = Market(books, trader, iterations, seed=int(seed)).run(config["strategy"])
+        book_pnls = trader.book_pnls()
+        for j, b in enumerate(books):
+            log = trader.log[b.label]
+            res["book_pnl"][k, j] = book_pnls[b.label]
+            res["position"][k, j] = log["position"]
+            res["fills"][k, j] = sum(qty for _, qty in log["trades"])
+            res["settlement"][k, j] = b.settlement
+            res["theo"][k, j] = b.theo
+    return res
+
+class SummaryReducer:
+    """Streaming merge of shard results into running totals, in any arrival order."""
+    def __init__(self, n_books: int) -> None:
+        self.sessions = 0
+        self.pnl_sum = 0.0
+        self.pnl_sumsq = 0.0
+        self.pnl_min = np.inf
+        self.pnl_max = -np.inf
+        self.book_pnl_sum = np.zeros(n_books)
+        self.position_sum = np.zeros(n_books, dtype=np.int64)
+        self.abs_position_sum = np.zeros(n_books, dtype=np.int64)
+        self.fills_sum = np.zeros(n_books, dtype=np.int64)
+
+    def update(self, shard: dict) -> None:
+        pnl = shard["pnl"]
+        self.sessions += len(pnl)
+        self.pnl_sum += pnl.sum()
+        self.pnl_sumsq += (pnl ** 2).sum()
+        self.pnl_min = min(self.pnl_min, pnl.min(initial=np.inf))
+        self.pnl_max = max(self.pnl_max, pnl.max(initial=-np.inf))
+        self.book_pnl_sum += shard["book_pnl"].sum(axis=0)
+        self.position_sum += shard["position"].sum(axis=0)
+        self.abs_position_sum += np.abs(shard["position"]).sum(axis=0)
+        self.fills_sum += shard["fills"].sum(axis=0)
+
+    def result(self) -> dict:
+        n = max(self.sessions, 1)
+        mean = self.pnl_sum / n
+        return {
+            "sessions": self.sessions,
+            "pnl_mean": mean,
+            "pnl_std": np.sqrt(max(self.pnl_sumsq / n - mean ** 2, 0)),
+            "pnl_min": self.pnl_min,
+            "pnl_max": self.pnl_max,
+            "book_pnl_mean": self.book_pnl_sum / n,
+            "position_mean": self.position_sum / n,
+            "abs_position_mean": self.abs_position_sum / n,
+            "fills_mean": self.fills_sum / n,
+        }
+
+def run_farm(config: dict, n_sessions: int, seed: int = 0, workers: int = None,
+             shard_size: int = 500, reducer: SummaryReducer = None, store=None,
+             player: str = 'farm') -> dict:
+    """Shards session seeds across a process pool and reduces the results as they arrive.
+    Args:
+        config (dict): Picklable session config, see default_config.
+        n_sessions (int): Number of sessions.
+        seed (int): Farm seed. Session seeds are derived from it, so runs are reproducible.
+        workers (int): Worker processes. Defaults to os.cpu_count().
+        shard_size (int): Sessions per task.
+        reducer (SummaryReducer): Reducer to merge into. Defaults to a new one.
+        store (store.ResultsStore): Where to keep every session's results, written
+            from this process as shards arrive. Not kept by default.
+        player (str): Name the sessions are stored under.
+    Returns:
+        dict: The reducer's summary.
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(n_sessions, dtype=np.uint64)
+    reducer = SummaryReducer(len(config["books"])) if reducer is None else reducer
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_shard, config, seeds[k:k + shard_size].tolist())
+                   for k in range(0, n_sessions, shard_size)]
+        for future in as_completed(futures):
+            shard = future.result()
+            reducer.update(shard)
+            if store is not None:
+                store.add_shard(config, shard, player)
+    if store is not None:
+        store.flush()
+    return reducer.result()
@@ -1,6 +1,15 @@
+import heapq
+import sys
+import time
+import itertools
+from collections import OrderedDict
 import numpy as np
-import pandas as pd
-from pytimedinput import timedInput
+# pandas, pytimedinput and asyncio are imported where used, so that headless
+# sessions and pool workers only pay for numpy
+from bots import Bot
+from paths import theo_paths
+from events import ConsoleSink, EventBus, EventType
+from render import LadderRenderer
 from abc import ABC, abstractmethod
 
 Bid = 1
@@ -8,13 +17,36 @@ Buy = 1
 Offer = -1
 Sell = -1
 side_map = {1: "Bid", -1: "Offer"}
+order_ids = itertools.count(1)
 
-def calc_n_quotes(n_books: int, scale: float = 2) -> int:
-    """Calculate number of quotes for a given update."""
-    return int(min(np.ceil(np.random.exponential(scale=scale)), n_books))
+# Struct-of-arrays quote batch for bulk paths; one row per quote
+QUOTE_DTYPE = np.dtype([('book', '<u2'), ('price', '<i4'), ('side', 'i1'), ('qty', '<u4')])
+
+# Parameters of the standard outright books of the demo, environments, farm and benchmarks
+BOOK_PARAMS = dict(std_min=5, std_max=50, theo_min=100, theo_max=250, settlement_std=25, cross_prob=0.4)
+
+def quote_batch(book, price, side, qty=1) -> np.ndarray:
+    """Builds a QUOTE_DTYPE array from per-quote book indices, prices, sides and quantities.
+    Prices are rounded to ticks like Quote.
+    """
+    batch = np.empty(np.broadcast(book, price, side, qty).shape, dtype=QUOTE_DTYPE)
+    batch['book'] = book
+    batch['price'] = np.round(price)
+    batch['side'] = side
+    batch['qty'] = qty
+    return batch
+
+def calc_n_quotes(n_books: int, scale: float = 2, rng: np.random.Generator = None, size: int = None):
+    """Calculate number of quotes for a given update, or an array of size updates."""
+    rng = np.random.default_rng() if rng is None else rng
+    if size is None:
+        return int(min(np.ceil(rng.exponential(scale=scale)), n_books))
+    return np.minimum(np.ceil(rng.exponential(scale=scale, size=size)), n_books).astype(int)
 
 def display_books(lst: list) -> None:
     """Takes in a list of books"""
+    import pandas as pd
+
     seperator = ['|']*10
     padding = ['']*5
 
@@ -27,56 +59,304 @@ def display_books(lst: list) -> None:
     df = pd.DataFrame(data=data)
     print(df.to_string())
 
+class Order:
+    """A resting order. owner is the Trader for user orders and None for bot quotes."""
+    __slots__ = ('id', 'price', 'qty', 'side', 'owner')
+
+    def __init__(self, price, qty: int = 1, side: int = Bid, owner=None, order_id: int = None) -> None:
+        self.id = next(order_ids) if order_id is None else order_id
+        self.price = price
+        self.qty = qty
+        self.side = side
+        self.owner = owner
+
+class PriceLevels:
+    """One side of a book, indexed by price level.
+
+    Each price holds a FIFO queue of resting orders, keyed by order id so any order
+    can be cancelled in O(1). Two heaps with lazy deletion
+    track the best and worst prices, so adding or removing a level is O(log n)
+    and reading the top of book is amortised O(1).
+    """
+    def __init__(self, side: int) -> None:
+        self.side = side
+        self._levels = {}
+        self._size = 0
+        self.user_orders = 0  # resting orders with an owner
+        self._best = []  # heap keyed so the best price is on top
+        self._worst = []  # heap keyed so the worst price is on top
+
+    def _best_key(self, price) -> float:
+        return -price if self.side == Bid else price
+
+    def _worst_key(self, price) -> float:
+        return price if self.side == Bid else -price
+
+    def __len__(self) -> int:
+        """Number of resting orders."""
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __contains__(self, price) -> bool:
+        return price in self._levels
+
+    def __iter__(self):
+        """Iterates over resting order prices in ascending order."""
+        for price in sorted(self._levels):
+            for _ in range(len(self._levels[price])):
+                yield price
+
+    def __repr__(self) -> str:
+        return f"{side_map[self.side]}s{list(self)}"
+
+    def append(self, price, qty: int = 1, owner=None, order_id: int = None) -> Order:
+        """Adds an order at the back of its price level's queue."""
+        order = Order(price, qty, self.side, owner, order_id)
+        level = self._levels.get(price)
+        if level is None:
+            level = self._levels[price] = OrderedDict()
+            heapq.heappush(self._best, self._best_key(price))
+            heapq.heappush(self._worst, self._worst_key(price))
+        level[order.id] = order
+        self._size += 1
+        self.user_orders += owner is not None
+        return order
+
+    def _drop_level(self, price) -> None:
+        del self._levels[price]
+        self._compact()
+
+    def evict(self) -> Order:
+        """Removes the newest bot order at the worst price holding one.
+        Returns it, or None if only user orders are resting.
+        """
+        def newest_bot(level):
+            return next((o for o in reversed(level.values()) if o.owner is None), None)
+
+        price = self.worst()
+        order = newest_bot(self._levels[price]) if price is not None else None
+        if order is None and price is not None:
+            # The worst level holds only user orders: scan from the worst end instead
+            pick = heapq.nsmallest if self.side == Bid else heapq.nlargest
+            for price in pick(len(self._levels), self._levels):
+                order = newest_bot(self._levels[price])
+                if order is not None:
+                    break
+        if order is not None:
+            self.cancel(order)
+        return order
+
+    def cancel(self, order: Order) -> None:
+        """Removes a specific resting order in O(1). Raises ValueError if it is not resting."""
+        level = self._levels.get(order.price)
+        if level is None or level.pop(order.id, None) is None:
+            raise ValueError(f"order {order.id} not in {side_map[self.side]}s")
+        if not level:
+            self._drop_level(order.price)
+        self._size -= 1
+        self.user_orders -= order.owner is not None
+
+    def match(self, qty: int, limit=None, inclusive: bool = False) -> list[tuple]:
+        """Fills up to qty against the best levels in price-time order.
+        Args:
+            qty (int): Quantity to fill.
+            limit: Only match levels strictly better for the aggressor than this price
+                (below it for offers, above it for bids). None matches at any price.
+            inclusive (bool): Also match levels at exactly the limit price.
+        Returns:
+            list[tuple]: (order, qty) filled per resting order, in fill order.
+        """
+        fills = []
+        while qty > 0 and self._size:
+            price = self.best()
+            if limit is not None and not (price < limit if self.side == Offer else price > limit):
+                if not (inclusive and price == limit):
+                    break
+            level = self._levels[price]
+            while qty > 0 and level:
+                order = next(iter(level.values()))
+                take = min(qty, order.qty)
+                order.qty -= take
+                qty -= take
+                fills.append((order, take))
+                if order.qty == 0:
+                    level.popitem(last=False)
+                    self._size -= 1
+                    self.user_orders -= order.owner is not None
+            if not level:
+                self._drop_level(price)
+        return fills
+
+    def top(self, n: int) -> list:
+        """Returns up to n best prices, best first, one entry per resting order."""
+        pick = heapq.nlargest if self.side == Bid else heapq.nsmallest
+        res = []
+        for price in pick(n, self._levels):
+            res.extend([price] * len(self._levels[price]))
+            if len(res) >= n:
+                break
+        return res[:n]
+
+    def ladder(self, n: int) -> list[tuple]:
+        """Returns (price, total qty) for up to n best price levels, best first."""
+        pick = heapq.nlargest if self.side == Bid else heapq.nsmallest
+        return [(price, sum(o.qty for o in self._levels[price].values()))
+                for price in pick(n, self._levels)]
+
+    def best(self):
+        """Returns the best price, or None if the side is empty."""
+        heap = self._best
+        while heap:
+            price = -heap[0] if self.side == Bid else heap[0]
+            if price in self._levels:
+                return price
+            heapq.heappop(heap)
+        return None
+
+    def worst(self):
+        """Returns the worst price, or None if the side is empty."""
+        heap = self._worst
+        while heap:
+            price = heap[0] if self.side == Bid else -heap[0]
+            if price in self._levels:
+                return price
+            heapq.heappop(heap)
+        return None
+
+    def _compact(self) -> None:
+        """Rebuilds the heaps once stale entries outnumber live levels."""
+        limit = 2 * len(self._levels) + 16
+        if len(self._best) > limit or len(self._worst) > limit:
+            self._best = [self._best_key(p) for p in self._levels]
+            self._worst = [self._worst_key(p) for p in self._levels]
+            heapq.heapify(self._best)
+            heapq.heapify(self._worst)
+
 class Book:
-    """A book is a collection of quotes for a given market."""
+    """A book is a collection of quotes for a given market.
+    Its bot quotes with generate_quote, unless bots are given: Market then quotes
+    through each Bot's batched quote() instead, and several bots may share a book.
+    """
+    min_price = None  # floor on bot quote prices
+
     def __init__(self, name: str, label: str, iterations: int, 
                  std_min: int, std_max: int, theo_min: int, theo_max: int,
-                 settlement_std: int, cross_prob: float):
-        self.bids = []
-        self.offers = []
+                 settlement_std: int, cross_prob: float, depth: int = 5,
+                 verbose: bool = True, events: EventBus = None, rng: np.random.Generator = None,
+                 max_qty: int = 1, bots: list[Bot] = None):
+        self.bids = PriceLevels(Bid)
+        self.offers = PriceLevels(Offer)
+        self.depth = depth
+        self.max_qty = max_qty
+        self.events = events if events is not None else EventBus()
+        self.verbose = verbose
+        self.listeners = []
+        self.orders = {}  # user orders resting in the book, by id
+        self.order_listeners = []  # called as listener(book, order_id, resting) as user orders rest and leave
+        self.bots = list(bots) if bots else []
+        self.inventory = 0  # the bots' net position from trading with the user
+        self.prev_mid = np.nan
         self.name = name
         self.label = label
         self.iterations = iterations
         self.std_min = std_min
         self.std_max = std_max
         self.cross_prob = cross_prob
-        self.theo = np.random.uniform(theo_min, theo_max)
-        self.settlement = np.random.normal(self.theo, settlement_std)
+        self.theo_min = theo_min
+        self.theo_max = theo_max
+        self.settlement_std = settlement_std
+        # Std of the settlement about the current theo; shrinks as a theo path runs down
+        self.remaining_std = settlement_std
+        self.rng = np.random.default_rng() if rng is None else rng
+        self._draws = []
+        Book.draw_fundamentals(self)
+
+    block_size = 256
+
+    def seed(self, rng: np.random.Generator) -> None:
+        """Gives the book a new Generator and redraws its theo and settlement from it."""
+        self.rng = rng
+        self._draws = []
+        for bot, child in zip(self.bots, rng.spawn(len(self.bots))):
+            bot.seed(child)
+        self.draw_fundamentals()
+
+    def draw_fundamentals(self) -> None:
+        """Draws theo and settlement."""
+        self.theo = self.rng.uniform(self.theo_min, self.theo_max)
+        self.settlement = self.rng.normal(self.theo, self.settlement_std)
+
+    def next_draw(self) -> tuple[float, float, float]:
+        """Returns (standard normal, uniform, uniform) draws, taken from the Generator in blocks."""
+        if not self._draws:
+            z = self.rng.standard_normal(self.block_size).tolist()
+            u = self.rng.random((2, self.block_size)).tolist()
+            self._draws = list(zip(z, *u))
+        return self._draws.pop()
+
+    @property
+    def verbose(self) -> bool:
+        """Whether the book's events are printed to the console."""
+        return any(isinstance(s, ConsoleSink) for s in self.events.sinks)
+
+    @verbose.setter
+    def verbose(self, value: bool) -> None:
+        consoles = [s for s in self.events.sinks if isinstance(s, ConsoleSink)]
+        if value and not consoles:
+            self.events.add_sink(ConsoleSink())
+        elif not value:
+            for s in consoles:
+                self.events.remove_sink(s)
 
     def get_best_offer(self) -> float:
         """Returns the best offer in the book."""
-        return min(self.offers) if self.offers else 2e16
+        return self.offers.best() if self.offers else 2e16
 
     def get_best_bid(self):
         """Returns the best bid in the book."""
-        return max(self.bids) if self.bids else -2e16
+        return self.bids.best() if self.bids else -2e16
+
+    def get_mid(self):
+        """Returns the mid price, the one-sided top if a side is empty, or None if both are."""
+        bid, offer = self.bids.best(), self.offers.best()
+        if bid is None or offer is None:
+            return offer if bid is None else bid
+        return (bid + offer) / 2
     
     def clean(self):
-        """Removes the worst bid and offer"""
-        if len(self.offers) > 5:
-            worst_offer = max(self.offers)
-            self.offers.remove(worst_offer)
-            print(f"{self.name}: Removed {worst_offer} Offer")
-        if len(self.bids) > 5:
-            worst_bid = min(self.bids)
-            self.bids.remove(worst_bid)
-            print(f"{self.name}: Removed {worst_bid} Bid")
+        """Removes the worst bot bid and offer once a side's bot quotes exceed the book depth.
+        User orders never count towards depth and are never evicted.
+        """
+        if len(self.offers) - self.offers.user_orders > self.depth:
+            order = self.offers.evict()
+            self.events.emit(EventType.CANCEL, self.name, Offer, order.price, order.qty)
+        if len(self.bids) - self.bids.user_orders > self.depth:
+            order = self.bids.evict()
+            self.events.emit(EventType.CANCEL, self.name, Bid, order.price, order.qty)
     
     def append(self, quote):
         """Appends a quote to the book"""
-        print(quote)
-        if quote.side == Bid:
-            self.bids.append(quote.price)
-        elif quote.side == Offer:
-            self.offers.append(quote.price)
+        self.rest(quote.price, quote.side, quote.qty)
+
+    def rest(self, price, side: int, qty: int = 1) -> None:
+        """Rests a bot order in the book and drops the worst levels past depth."""
+        self.events.emit(EventType.QUOTE, self.name, side, price, qty)
+        if side == Bid:
+            self.bids.append(price, qty)
+        elif side == Offer:
+            self.offers.append(price, qty)
 
         self.clean()
 
     def generate_quote(self, i: int):
         """Generates a quote for the book. Returns a Quote object."""
         # bid = 1
-        price = np.random.normal(self.theo, self.calc_decayed_var(i))
-        cross = np.random.uniform() < self.cross_prob # the bot will cross itself (quote a bad price)
+        z, u, v = self.next_draw()
+        price = self.theo + self.calc_decayed_var(i) * z
+        cross = u < self.cross_prob # the bot will cross itself (quote a bad price)
+        qty = 1 + int(v * self.max_qty)
 
         if price < self.theo:
             if cross:
@@ -89,41 +369,138 @@ class Book:
             else:
                 side = Offer
 
-        return Quote(price, side, self.name)
+        return Quote(price, side, self.name, qty)
 
     def process_quote(self, quote):
-        """Processes a quote and updates the book."""
-        # Quote is in cross
-        best_offer = self.get_best_offer()
-        best_bid = self.get_best_bid()
-        lift = quote.side == Bid and quote.price > best_offer
-        hit = quote.side == Offer and quote.price < best_bid
-
-        if lift:
-            print(f"{self.name}: {best_offer} Offer Lifted")
-            self.offers.remove(best_offer)
-        elif hit:
-            print(f"{self.name}: {best_bid} Bid Hit")
-            self.bids.remove(best_bid)
+        """Processes a quote and updates the book.
+        A crossing quote sweeps the opposite side in price-time order, and any
+        quantity left over rests in the book.
+        Args:
+            quote (Quote | np.ndarray): A Quote, or a QUOTE_DTYPE batch of this book's
+                quotes, processed in order. The batch's book column is ignored.
+        """
+        if isinstance(quote, np.ndarray):
+            for _, price, side, qty in quote.tolist():
+                self.match_quote(price, side, qty)
         else:
-            self.append(quote)
-
-    def process_action(self, raw_action) -> bool:
-        """Returns true if the action was able to be processed correctly"""
-        if raw_action == 'h':
-            price = self.get_best_bid()
-            print(f'{self.name}: Sold @ {price}!')
-            self.bids.remove(price)
-            return True, Sell * price
-
-        elif raw_action == 'l':
-            price = self.get_best_offer()
-            print(f'{self.name}: Bought @ {price}!')
-            self.offers.remove(price)
-            return True, Buy * price
-        
-        return False, None
+            self.match_quote(quote.price, quote.side, quote.qty)
+        self.notify()
+
+    def match_quote(self, price, side: int, qty: int = 1) -> None:
+        """Matches one bot quote against the book and rests the remainder, without notifying."""
+        if side == Bid:
+            fills = self.offers.match(qty, limit=price)
+            event = EventType.LIFT
+        else:
+            fills = self.bids.match(qty, limit=price)
+            event = EventType.HIT
+
+        for order, filled in fills:
+            self.events.emit(event, self.name, -side, order.price, filled)
+            qty -= filled
+        self.fill_resting(fills)
+        if qty > 0:
+            self.rest(price, side, qty)
+
+    def process_action(self, raw_action, qty: int = 1):
+        """Hits ('h') or lifts ('l') up to qty against the top of the book.
+        Returns:
+            tuple: (True, [(signed price, qty), ...] per level filled), or (False, None)
+                if nothing traded.
+        """
+        if raw_action == 'h' and self.bids:
+            side, levels = Sell, self.bids
+        elif raw_action == 'l' and self.offers:
+            side, levels = Buy, self.offers
+        else:
+            return False, None
+
+        fills = levels.match(qty)
+        for order, filled in fills:
+            self.events.emit(EventType.FILL, self.name, side, order.price, filled)
+            self.inventory -= side * filled
+        self.fill_resting(fills)
+        self.notify()
+        return True, [(side * order.price, filled) for order, filled in fills]
+
+    def fill_resting(self, fills: list[tuple]) -> None:
+        """Books passive fills of user orders with their owners."""
+        for order, filled in fills:
+            if order.owner is None:
+                continue
+            self.events.emit(EventType.FILL, self.name, order.side, order.price, filled)
+            order.owner.process_action(order.side * order.price, self.label, order.side, filled)
+            self.inventory -= order.side * filled
+            if order.qty == 0:
+                del self.orders[order.id]
+                self.notify_order(order.id, False)
+
+    def submit(self, side: int, price, qty: int, owner, order_id: int = None):
+        """Submits a user limit order. It trades against anything at or through its
+        price and the rest joins the book.
+        Returns:
+            tuple: (resting Order or None if fully filled, [(signed price, qty), ...] filled now)
+        """
+        levels, opposite = (self.bids, self.offers) if side == Bid else (self.offers, self.bids)
+        fills = opposite.match(qty, limit=price, inclusive=True)
+        for order, filled in fills:
+            self.events.emit(EventType.FILL, self.name, side, order.price, filled)
+            self.inventory -= side * filled
+            qty -= filled
+        self.fill_resting(fills)
+
+        order = None
+        if qty > 0:
+            order = levels.append(price, qty, owner, order_id)
+            self.orders[order.id] = order
+            self.notify_order(order.id, True)
+            self.events.emit(EventType.ORDER, self.name, side, price, qty)
+        self.notify()
+        return order, [(side * o.price, filled) for o, filled in fills]
+
+    def cancel(self, order_id: int) -> Order:
+        """Cancels a resting user order by id. Returns it, or None if it is no longer resting."""
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        (self.bids if order.side == Bid else self.offers).cancel(order)
+        self.notify_order(order_id, False)
+        self.events.emit(EventType.CANCEL, self.name, order.side, order.price, order.qty)
+        self.notify()
+        return order
+
+    def amend(self, order_id: int, price=None, qty: int = None):
+        """Amends a resting user order. Reducing quantity keeps queue priority, a price
+        change or size increase cancels and resubmits it under the same id.
+        Returns:
+            tuple: As submit, or (None, []) if the order is no longer resting.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return None, []
+        price = order.price if price is None else price
+        qty = order.qty if qty is None else qty
+        if qty <= 0:
+            self.cancel(order_id)
+            return None, []
+        if price == order.price and qty <= order.qty:
+            order.qty = qty
+            self.events.emit(EventType.ORDER, self.name, order.side, price, qty)
+            self.notify()
+            return order, []
+        self.cancel(order_id)
+        return self.submit(order.side, price, qty, order.owner, order_id)
     
+    def notify(self) -> None:
+        """Tells listeners (e.g. a LadderRenderer) that the book has changed."""
+        for listener in self.listeners:
+            listener(self)
+
+    def notify_order(self, order_id: int, resting: bool) -> None:
+        """Tells order listeners (e.g. a Market's order index) a user order rested or left."""
+        for listener in self.order_listeners:
+            listener(self, order_id, resting)
+
     def calc_decayed_var(self, i: int) -> float:
         """Linear decaying variance"""
         var_width = self.std_max - self.std_min
@@ -131,26 +508,95 @@ class Book:
 
         return self.std_max - i*dec_per_it
 
+def book_kwargs(n_books: int = 2, **params) -> list[dict]:
+    """Book kwargs, less iterations, for n_books standard outrights labelled a, b, ...
+    (f26, f27, ... past z). params override BOOK_PARAMS and the Book defaults.
+    """
+    labels = [chr(ord('a') + k) if k < 26 else f'f{k}' for k in range(n_books)]
+    return [dict(BOOK_PARAMS, name=f'Future {label.upper()}', label=label, **params) for label in labels]
+
+def make_books(n_books: int = 2, iterations: int = 20, verbose: bool = False, **params) -> list[Book]:
+    """n_books standard outright Books, see book_kwargs."""
+    return [Book(iterations=iterations, verbose=verbose, **kw) for kw in book_kwargs(n_books, **params)]
+
 class Trader:
+    """Keeps a running position, average entry price, cash and realized PnL per book,
+    updated in O(1) per fill, so live risk and settlement never rescan the trades.
+    """
     def __init__(self, books: list[Book], name: str) -> None:
+        self.name = name
         self.log = {
             b.label: {
                 "book": b,
-                "trades": []
+                "trades": [],
+                "position": 0,
+                "avg_price": 0.0,
+                "cash": 0.0,
+                "realized": 0.0
             }
         for b in books}
+        self.profiler = None  # set by Market; its report is printed after reconcile
+
+    def process_action(self, trade: float, book_label: str, side: int = None, qty: int = 1) -> None:
+        """Records a fill of qty given as a signed price (side * price), kept in the
+        book's trades as (signed price, qty). side is needed when prices can be zero
+        or negative.
+        """
+        v = self.log[book_label]
+        side = int(np.sign(trade)) if side is None else side
+        price = trade * side
+        v['trades'].append((trade, qty))
+        v['cash'] -= side * price * qty
+
+        pos = v['position']
+        new_pos = pos + side * qty
+        if pos == 0 or (pos > 0) == (side > 0):
+            # Adding to the position: blend the entry price
+            v['avg_price'] = (v['avg_price'] * abs(pos) + price * qty) / abs(new_pos)
+        else:
+            # Reducing: realize against the entry price, re-enter at price if flipped
+            closed = min(qty, abs(pos))
+            v['realized'] += closed * (price - v['avg_price']) * (1 if pos > 0 else -1)
+            if new_pos == 0:
+                v['avg_price'] = 0.0
+            elif (new_pos > 0) != (pos > 0):
+                v['avg_price'] = price
+        v['position'] = new_pos
 
-    def process_action(self, trade: float, book_label: str) -> None:
-        self.log[book_label]['trades'].append(trade)
+    def mark(self, book_label: str) -> float:
+        """Mark price for a book: its current mid, or the entry price if it has none."""
+        v = self.log[book_label]
+        mid = v['book'].get_mid()
+        return v['avg_price'] if mid is None else mid
 
-    def reconcile(self) -> None:
+    def risk(self) -> dict:
+        """Live position and PnL per book, marked to the books' current mids."""
+        res = {}
+        for label, v in self.log.items():
+            unrealized = v['position'] * (self.mark(label) - v['avg_price']) if v['position'] else 0.0
+            res[label] = {
+                "position": v['position'],
+                "avg_price": v['avg_price'],
+                "realized": v['realized'],
+                "unrealized": unrealized,
+                "pnl": v['realized'] + unrealized,
+            }
+        return res
+
+    def book_pnls(self) -> dict:
+        """Returns the settled PnL of every book, keyed by label."""
+        return {label: round(v['cash'] + v['book'].settlement*v['position'], 2)
+                for label, v in self.log.items()}
+
+    def reconcile(self, verbose: bool = True) -> float:
+        """Settles every book and returns the overall PnL."""
         pnls = []
-        for _, v in self.log.items():
+        book_pnls = self.book_pnls()
+        for label, v in self.log.items():
             b = v['book']
-            trades = v['trades']
-            pos = sum([np.sign(t) for t in trades])
+            pos = v['position']
 
-            pnl = round(b.settlement*pos - sum(trades), 2)
+            pnl = book_pnls[label]
             pnls.append(pnl)
             
             book_res = {
@@ -160,33 +606,109 @@ class Trader:
                 "Market Theo": b.theo,
                 "PnL": f"$ {pnl}"
             }
-            print(f"{b.name}: ")
-            print(book_res)
+            if verbose:
+                print(f"{b.name}: ")
+                print(book_res)
 
-        print(f"Overall PnL: $ {sum(pnls)}")
+        if verbose: print(f"Overall PnL: $ {sum(pnls)}")
+        if verbose and self.profiler is not None:
+            print(self.profiler.report())
+        return sum(pnls)
         
 class Quote:
     """A quote on an order book."""
-    def __init__(self, price, side, book_name) -> None:
+    __slots__ = ('book_name', 'price', 'side', 'qty')
+
+    def __init__(self, price, side, book_name, qty: int = 1) -> None:
         self.book_name = book_name
         self.price = round(price)
         self.side = side  # 1 = bid, # 0 = offer
+        self.qty = qty
 
     def __repr__(self):
         """String representation of a quote."""
-        return f"{self.book_name}: {side_map[self.side]} {self.price}"
+        size = f"{self.qty} @ " if self.qty != 1 else ""
+        return f"{self.book_name}: {side_map[self.side]} {size}{self.price}"
 
 class Market:
     """A class to trigger and maintain market simulation."""
-    def __init__(self, books: list[Book], trader: Trader, iterations: int):
+    block_size = 256
+
+    def __init__(self, books: list[Book], trader: Trader, iterations: int, seed: int = None,
+                 profiler=None):
+        """
+        Args:
+            seed (int): Session seed. When given, the market and every book get their
+                own Generator spawned from it via SeedSequence, and the books' theos
+                and settlements are redrawn, so the session is fully reproducible.
+            profiler (profiling.Profiler): Times each stage of start and run, counts
+                book events and reports at the end of Trader.reconcile. Off by default.
+        """
         self.books = books
         self.book_map = {b.label: b for b in books}
         self.trader = trader
         self.iterations = iterations
+        self.seed = seed
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.attach(books)
+            trader.profiler = profiler
+        self.seed_seq = np.random.SeedSequence(seed)
+        children = self.seed_seq.spawn(len(books) + 1)
+        self.rng = np.random.default_rng(children[0])
+        self._quote_draws = []
+        # Outrights first so options and spreads derive from their legs
+        derived = [isinstance(b, (Option, Spread)) for b in books]
+        self._derive_order = sorted(range(len(books)), key=derived.__getitem__)
+        self.outrights = [b for b, d in zip(books, derived) if not d]
+        self.theo_paths = None
+        self.path_vol = None
+        self.order_books = {order_id: b for b in books for order_id in b.orders}  # resting user order id -> Book
+        for b in books:
+            b.order_listeners.append(self._on_order)
+        self.spreads = [b for b in books if isinstance(b, Spread)]
+        if seed is not None:
+            for k in self._derive_order:
+                books[k].seed(np.random.default_rng(children[k + 1]))
+        options = [b for b in books if isinstance(b, Option)]
+        self.option_chain = OptionChain(options) if options else None
+        self.combo_chain = ComboChain(self.spreads) if self.spreads else None
+
+    def split_action(self, string) -> tuple:
+        """Split an action into (action, qty, target, price). Returns None if it is not valid.
+        Actions:
+            'ha', 'l5a': hit/lift [qty] on book a. price is None.
+            'ba@120', 'o3a@125': rest a bid/offer of [qty] on book a at a price.
+            'c12': cancel order 12. target is the order id.
+            'm12@121', 'm12@121x2': amend order 12's price [and qty].
+        """
+        if len(string) < 2 or string[0] not in ['l', 'h', 'b', 'o', 'c', 'm']:
+            return None
+        action, rest = string[0], string[1:]
+        price = qty = None
+        try:
+            if action in 'bom':
+                rest, _, price = rest.partition('@')
+                if action == 'm' and 'x' in price:
+                    price, _, qty = price.partition('x')
+                    qty = int(qty)
+                price = int(price)
+            if action in 'cm':
+                return action, qty, int(rest), price
+        except ValueError:
+            return None
+
+        # Labels may contain digits (e.g. option 'a150c'), so try the shortest quantity first
+        for k in range(len(rest)):
+            if k and not rest[:k].isdigit():
+                break
+            if rest[k:] in self.book_map and (k == 0 or int(rest[:k]) > 0):
+                return action, int(rest[:k]) if k else 1, rest[k:], price
+        return None
 
     def input_valid(self, string) -> bool:
         """Check if user input is valid."""
-        return string[0] in ['l', 'h'] and string[1] in self.book_map.keys()
+        return self.split_action(string) is not None
 
     def input_parse(self, user_input: str) -> list[str]:
         """Parse user input into a list of actions.
@@ -205,6 +727,8 @@ class Market:
             timeout (int): Number of seconds to wait for user input.
         Returns:
             list[str]: List of user actions."""
+        from pytimedinput import timedInput
+
         user_input, missed = timedInput(
             prompt = 'Enter Trades: ', timeout=timeout, 
             resetOnInput=False, endCharacters='\r')
@@ -219,111 +743,613 @@ class Market:
             actions = self.input_parse(user_input)
             return actions
 
-    def process_actions(self, actions:list) -> None:
+    def process_actions(self, actions:list, trader: Trader = None) -> int:
         """Process user actions. 
         Args:
-            actions (list): List of tuples of the form (action, book_label)
+            actions (list): List of actions as accepted by split_action, e.g. 'ha', 'l5a',
+                'ba@120', 'c12'
+            trader (Trader): Whose actions they are. Defaults to the market's trader.
+                Orders can only be cancelled or amended by the trader that placed them.
+        Returns:
+            int: Number of actions that traded.
         """
         if actions is None:
-            return
+            return 0
+        trader = self.trader if trader is None else trader
         
-        for action, book_label in actions:
-            book = self.book_map[book_label]
-            processed, trade = book.process_action(action)
-            if processed:
-                self.trader.process_action(trade, book_label)
+        fills = 0
+        for a in actions:
+            action, qty, target, price = self.split_action(a)
+            if action in 'hl':
+                book = self.book_map[target]
+                side = Buy if action == 'l' else Sell
+                processed, trades = book.process_action(action, qty)
+            elif action in 'bo':
+                book = self.book_map[target]
+                side = Bid if action == 'b' else Offer
+                _, trades = book.submit(side, price, qty, trader)
+            else:
+                book = self.order_book(target)
+                order = book.orders[target] if book is not None else None
+                if order is None or order.owner is not trader:
+                    continue
+                if action == 'c':
+                    book.cancel(target)
+                    continue
+                side = order.side
+                _, trades = book.amend(target, price, qty)
+
+            if trades:
+                for trade, filled in trades:
+                    trader.process_action(trade, book.label, side, filled)
+                fills += 1
+        return fills
             
+    def order_book(self, order_id: int) -> Book:
+        """The book a user order is resting in, or None once it has filled or been cancelled."""
+        return self.order_books.get(order_id)
+
+    def _on_order(self, book: Book, order_id: int, resting: bool) -> None:
+        """Keeps order_books in step with the books, so filled and cancelled orders leave it."""
+        if resting:
+            self.order_books[order_id] = book
+        else:
+            self.order_books.pop(order_id, None)
+
+    def set_iteration(self, i: int) -> None:
+        """Stamp subsequent book events with iteration i, and move outright theos
+        along their paths if the market has them. Along a path only the remaining
+        iterations' variance is left, so remaining_std becomes vol * sqrt(iterations - i).
+        """
+        for b in self.books:
+            b.events.iteration = i
+        if self.theo_paths is not None:
+            remaining = np.sqrt(self.iterations - i)
+            for b, theo, vol in zip(self.outrights, self.theo_paths[i].tolist(), self.path_vol.tolist()):
+                b.theo, b.remaining_std = theo, vol * remaining
+            for s in self.spreads:
+                s.remaining_std = float(np.sqrt(sum((w * b.remaining_std) ** 2 for b, w in s.legs)))
+
+    def set_theo_paths(self, paths: np.ndarray, vol=None) -> None:
+        """Makes the outright books' theos follow paths, settling at their terminal values.
+        Options and spreads are rederived from them.
+        Args:
+            paths (np.ndarray): (iterations + 1, n outrights) array, see paths.theo_paths.
+            vol: Per-iteration std of the paths, scalar or per outright, from which option
+                theos take the remaining variance. Defaults to settlement_std / sqrt(iterations).
+        """
+        paths = np.asarray(paths, dtype=float)
+        if paths.shape != (self.iterations + 1, len(self.outrights)):
+            raise ValueError(f"theo paths must have shape {(self.iterations + 1, len(self.outrights))}, "
+                             f"got {paths.shape}")
+        if vol is None:
+            vol = np.array([b.settlement_std for b in self.outrights], dtype=float) / np.sqrt(self.iterations)
+        self.theo_paths = paths
+        self.path_vol = np.broadcast_to(np.asarray(vol, dtype=float), (len(self.outrights),))
+        for b, settlement in zip(self.outrights, paths[-1].tolist()):
+            b.settlement = settlement
+        self.set_iteration(0)
+        for k in self._derive_order[len(self.outrights):]:
+            self.books[k].draw_fundamentals()
+
+    def draw_theo_paths(self, vol=None, corr=None, jump_prob: float = 0.0, jump_std: float = 0.0) -> np.ndarray:
+        """Draws and sets correlated theo paths for the outrights, starting at their theos.
+        Args:
+            vol: Per-iteration step std, scalar or per outright. Defaults to
+                settlement_std / sqrt(iterations), so terminal dispersion matches the
+                static settlement draw.
+            corr: Correlation matrix across the outrights, or None for independent paths.
+            jump_prob (float), jump_std (float): Jump-diffusion parameters, see paths.theo_paths.
+        Returns:
+            np.ndarray: The (iterations + 1, n outrights) paths.
+        """
+        if vol is None:
+            vol = np.array([b.settlement_std for b in self.outrights], dtype=float) / np.sqrt(self.iterations)
+        # A dedicated child stream, so adding paths leaves the quote draws unchanged
+        rng = np.random.default_rng(self.seed_seq.spawn(1)[0])
+        paths = theo_paths([b.theo for b in self.outrights], self.iterations, vol, corr,
+                           jump_prob, jump_std, rng=rng)
+        # Jumps add jump_prob * jump_std ** 2 to each step's variance
+        self.set_theo_paths(paths, np.sqrt(np.square(vol) + jump_prob * jump_std ** 2))
+        return paths
+
+    def next_quote_books(self) -> list[int]:
+        """Returns the indices of the books quoting next, drawn in blocks of iterations."""
+        if not self._quote_draws:
+            n_books = len(self.books)
+            n_quotes = calc_n_quotes(n_books, rng=self.rng, size=self.block_size).tolist()
+            order = self.rng.random((self.block_size, n_books)).argsort(axis=1).tolist()
+            self._quote_draws = [o[:n] for n, o in zip(n_quotes, order)]
+        return self._quote_draws.pop()
+
+    def generate_quotes(self, i: int) -> None:
+        """Have a random subset of books quote for iteration i."""
+        self.set_iteration(i)
+        if self.option_chain is not None:
+            self.option_chain.reprice()
+        if self.combo_chain is not None:
+            self.combo_chain.reprice()
+        prof = self.profiler
+        botted = []
+        for j in self.next_quote_books():
+            b = self.books[j]
+            if b.bots:
+                botted.append(j)
+                continue
+            if prof is None:
+                b.process_quote(b.generate_quote(i))
+                continue
+            t0 = time.perf_counter_ns()
+            q = b.generate_quote(i)
+            t1 = time.perf_counter_ns()
+            b.process_quote(q)
+            prof.record("generate_quote", t1 - t0, b.label)
+            prof.record("process_quote", time.perf_counter_ns() - t1, b.label)
+        if botted:
+            if prof is None:
+                self.process_quotes(self.bot_quotes(botted, i))
+                return
+            t0 = time.perf_counter_ns()
+            batch = self.bot_quotes(botted, i)
+            t1 = time.perf_counter_ns()
+            self.process_quotes(batch)
+            prof.record("bot_quotes", t1 - t0)
+            prof.record("process_quotes", time.perf_counter_ns() - t1)
+
+    def book_states(self, idx: list[int], i: int) -> dict:
+        """Batched Bot state for the books at idx, one row per book. See bots.Bot."""
+        books = [self.books[j] for j in idx]
+        # One pass over the books into a (fields, N) array; empty sides (None) become nan
+        theo, std, cross_prob, max_qty, best_bid, best_offer, prev_mid, inventory = np.array(
+            [(b.theo, b.calc_decayed_var(i), b.cross_prob, b.max_qty, b.bids.best(), b.offers.best(),
+              b.prev_mid, b.inventory) for b in books], dtype=float).T
+        mid = np.where(np.isnan(best_bid), best_offer,
+                       np.where(np.isnan(best_offer), best_bid, (best_bid + best_offer) / 2))
+        for b, m in zip(books, mid.tolist()):
+            b.prev_mid = m
+        return {
+            "theo": theo, "std": std, "cross_prob": cross_prob, "max_qty": max_qty.astype(np.int64),
+            "best_bid": best_bid, "best_offer": best_offer, "mid": mid, "prev_mid": prev_mid,
+            "inventory": inventory.astype(np.int64),
+        }
+
+    def bot_quotes(self, idx: list[int], i: int) -> np.ndarray:
+        """Collects quotes from the bots of the books at idx as one QUOTE_DTYPE batch.
+        Each Bot is called once, with the rows of every book it quotes in.
+        """
+        groups = {}
+        for r, j in enumerate(idx):
+            for bot in self.books[j].bots:
+                groups.setdefault(id(bot), (bot, []))[1].append(r)
+        state = self.book_states(idx, i)
+        idx = np.asarray(idx)
+        floor = np.array([-np.inf if b.min_price is None else b.min_price
+                          for b in (self.books[j] for j in idx.tolist())])
+        batches = []
+        for bot, rows in groups.values():
+            rows = np.asarray(rows)
+            row, price, side, qty = bot.quote({k: v[rows] for k, v in state.items()}, i)
+            row = rows[np.asarray(row, dtype=np.int64)]
+            batches.append(quote_batch(idx[row], np.maximum(price, floor[row]), side, qty))
+        batch = np.concatenate(batches)
+        return batch[batch['qty'] > 0]
+
+    def process_quotes(self, batch: np.ndarray) -> None:
+        """Routes a QUOTE_DTYPE batch to the books by index, processing rows in order
+        and notifying each touched book once.
+        """
+        touched = set()
+        for j, price, side, qty in batch.tolist():
+            self.books[j].match_quote(price, side, qty)
+            touched.add(j)
+        for j in touched:
+            self.books[j].notify()
+
     def start(self):
         """Start the market simulation. 
         Each iteration generates quotes and processes user actions.
         """
-        n_books = len(self.books)
-        for i in range(self.iterations):
-            # Generate and print quotes
-            n_quotes = calc_n_quotes(n_books)
-            quote_books = np.random.choice(self.books, size=n_quotes, replace=False)
-            for b in quote_books:
-                q = b.generate_quote(i)
-                b.process_quote(q)
-
-            # Listen for user actions & execute
-            actions = self.input_request(timeout=2)
-            if actions == 'END': break
-            self.process_actions(actions)
-            
-            # Display Books
-            display_books(self.books)
+        renderer = LadderRenderer(self.books)
+        renderer.open()
+        prof = self.profiler
+        stage = self.timed if prof is not None else self.untimed
+        if prof is not None:
+            prof.start()
+        try:
+            for i in range(self.iterations):
+                # Generate and print quotes
+                stage("quotes", self.generate_quotes, i)
+
+                # Listen for user actions & execute
+                actions = stage("input", self.input_request, 2)
+                if actions == 'END': break
+                stage("process_actions", self.process_actions, actions)
+                
+                # Display Books
+                stage("render", renderer.render)
+
+                # Listen for user actions & execute
+                actions = stage("input", self.input_request, 2)
+                if actions == 'END': break
+                stage("process_actions", self.process_actions, actions)
+        finally:
+            if prof is not None:
+                prof.stop()
+            renderer.close()
 
-            # Listen for user actions & execute
-            actions = self.input_request(timeout=2)
-            if actions == 'END': break
-            self.process_actions(actions)
+    def timed(self, name: str, func, *args):
+        """Calls func(*args), recording its latency under stage name."""
+        t0 = time.perf_counter_ns()
+        res = func(*args)
+        self.profiler.record(name, time.perf_counter_ns() - t0)
+        return res
 
-class Option(Book):
-    def __init__(self, underlying, strike) -> None:
-        super().__init__()
+    @staticmethod
+    def untimed(name: str, func, *args):
+        return func(*args)
+
+    def run(self, strategy=None, verbose: bool = False, tape=None, session: int = 0) -> float:
+        """Run the market simulation headless, without waiting on user input.
+        Args:
+            strategy (callable): Called as strategy(market, i) once per iteration,
+                after quotes are generated. Returns user-style actions such as
+                ['ha', 'lb'] (or None) in place of typed input.
+            verbose (bool): Print market activity and the final reconcile.
+            tape (tape.QuoteTape): Replay quotes from a pre-generated tape instead of
+                generating them. The tape must have been written for books like this
+                market's, in the same order, and for as many iterations. Outright theos
+                and settlements are taken from the tape, and options and spreads
+                rederived from them. Tapes hold no sizes, so every quote replays at
+                qty 1 whatever the book's max_qty, and the session's rows are copied
+                out of the mapped file into one quote batch before the run.
+            session (int): Session of the tape to replay.
+        Returns:
+            float: Overall PnL from Trader.reconcile.
+        Raises:
+            ValueError: If the tape's book count or iterations differ from the market's,
+                or session is not on the tape.
+        """
+        if tape is not None:
+            if tape.n_books != len(self.books) or tape.iterations != self.iterations:
+                raise ValueError(f"Tape of {tape.n_books} books over {tape.iterations} iterations does not fit "
+                                 f"a market of {len(self.books)} books over {self.iterations} iterations")
+            if not 0 <= session < len(tape):
+                raise ValueError(f"Session {session} is not on a tape of {len(tape)} sessions")
+            quotes = tape.session(session)
+            theos, settlements = quotes['theo'].tolist(), quotes['settlement'].tolist()
+            for k in self._derive_order[:len(self.outrights)]:
+                self.books[k].theo, self.books[k].settlement = theos[k], settlements[k]
+            for k in self._derive_order[len(self.outrights):]:
+                self.books[k].draw_fundamentals()
+            bounds = np.searchsorted(quotes['iteration'], np.arange(self.iterations + 1)).tolist()
+            batch = quote_batch(quotes['book'], quotes['price'], quotes['side'])
+
+        prev_verbose = [b.verbose for b in self.books]
+        for b in self.books:
+            b.verbose = verbose
+        prof = self.profiler
+        if prof is not None:
+            prof.start()
+        try:
+            for i in range(self.iterations):
+                if prof is not None:
+                    t0 = time.perf_counter_ns()
+                if tape is None:
+                    self.generate_quotes(i)
+                else:
+                    self.set_iteration(i)
+                    self.process_quotes(batch[bounds[i]:bounds[i + 1]])
+                if prof is not None:
+                    t1 = time.perf_counter_ns()
+                    prof.record("quotes", t1 - t0)
+
+                if strategy is None:
+                    continue
+                actions = strategy(self, i)
+                if prof is not None:
+                    t2 = time.perf_counter_ns()
+                    prof.record("strategy", t2 - t1)
+                if actions:
+                    self.process_actions([a for a in actions if self.input_valid(a)])
+                    if prof is not None:
+                        prof.record("process_actions", time.perf_counter_ns() - t2)
+        finally:
+            if prof is not None:
+                prof.stop()
+            for b, v in zip(self.books, prev_verbose):
+                b.verbose = v
+
+        return self.trader.reconcile(verbose=verbose)
+
+    async def start_async(self, tick: float = 2, quote_interval: float = None,
+                          inputs: 'asyncio.Queue' = None) -> list[int]:
+        """Start the market simulation on an asyncio event loop.
+        Every book's bot quotes from its own task after exponentially distributed
+        waits, while user input is applied as soon as it arrives.
+        Args:
+            tick (float): Seconds per iteration. The session lasts iterations * tick.
+            quote_interval (float): Mean seconds between quotes per book. Defaults to tick.
+            inputs (asyncio.Queue): Source of (perf_counter_ns, raw input) items.
+                Defaults to a reader thread on stdin.
+        Returns:
+            list[int]: Action-to-fill latencies in nanoseconds.
+        """
+        import asyncio
+        import threading
+
+        quote_interval = tick if quote_interval is None else quote_interval
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        start = time.perf_counter()
+        latencies = []
+        current = -1  # the iteration books and theo paths were last set to
+
+        def iteration() -> int:
+            return min(int((time.perf_counter() - start) / tick), self.iterations - 1)
+
+        async def quote_book(j: int):
+            nonlocal current
+            book = self.books[j]
+            while True:
+                await asyncio.sleep(book.rng.exponential(quote_interval))
+                i = iteration()
+                if i != current:
+                    current = i
+                    self.set_iteration(i)
+                if isinstance(book, (Option, Spread)):
+                    book.theo = book.calc_theo()
+                if book.bots:
+                    self.process_quotes(self.bot_quotes([j], i))
+                else:
+                    book.process_quote(book.generate_quote(i))
+
+        async def display():
+            while True:
+                renderer.render()
+                await asyncio.sleep(min(tick, 0.1))
+
+        async def act():
+            while True:
+                received, user_input = await inputs.get()
+                if user_input.strip() == 'end':
+                    done.set()
+                    return
+                if self.process_actions(self.input_parse(user_input.strip())):
+                    latencies.append(time.perf_counter_ns() - received)
+
+        if inputs is None:
+            inputs = asyncio.Queue()
+
+            def read_stdin():
+                for line in sys.stdin:
+                    loop.call_soon_threadsafe(inputs.put_nowait, (time.perf_counter_ns(), line))
+
+            threading.Thread(target=read_stdin, daemon=True).start()
+
+        renderer = LadderRenderer(self.books)
+        renderer.open()
+        tasks = [asyncio.create_task(quote_book(j)) for j in range(len(self.books))]
+        tasks += [asyncio.create_task(display()), asyncio.create_task(act())]
+        try:
+            await asyncio.wait_for(done.wait(), timeout=self.iterations * tick)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            renderer.close()
+
+        if latencies:
+            lat_us = np.array(latencies) / 1e3
+            print(f"Action-to-fill latency: median {np.median(lat_us):.1f} us, "
+                  f"p99 {np.percentile(lat_us, 99):.1f} us over {len(lat_us)} fills")
+        return latencies
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF (Abramowitz & Stegun 7.1.26, error below 1e-7)."""
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal PDF."""
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+def option_theo(forward, strike, std, is_call) -> np.ndarray:
+    """Expected payoff of calls/puts when the underlying settles N(forward, std).
+    This is the normal (Bachelier) model, which matches how Book.settlement is drawn.
+    All arguments broadcast, so a whole strike chain is priced in one call.
+    """
+    forward, strike, std = np.asarray(forward, float), np.asarray(strike, float), np.asarray(std, float)
+    moneyness = forward - strike
+    d = moneyness / std
+    call = moneyness * norm_cdf(d) + std * norm_pdf(d)
+    return np.where(is_call, call, call - moneyness)  # put-call parity
+
+class Option(Book, ABC):
+    """An option book whose bot quotes around a model theo off the underlying book.
+    Quote noise defaults to a fifth of the underlying's. The option settles at its
+    payoff against the underlying's settlement.
+    """
+    is_call = None
+    suffix = None
+    min_price = 1
+
+    def __init__(self, underlying: Book, strike: int, std_min: float = None, std_max: float = None,
+                 cross_prob: float = None, depth: int = None, verbose: bool = True,
+                 events: EventBus = None) -> None:
+        super().__init__(
+            name=f"{underlying.name} {strike} {self.suffix}",
+            label=f"{underlying.label}{strike}{self.suffix[0].lower()}",
+            iterations=underlying.iterations,
+            std_min=underlying.std_min / 5 if std_min is None else std_min,
+            std_max=underlying.std_max / 5 if std_max is None else std_max,
+            theo_min=0, theo_max=0, settlement_std=underlying.settlement_std,
+            cross_prob=underlying.cross_prob if cross_prob is None else cross_prob,
+            depth=underlying.depth if depth is None else depth,
+            verbose=verbose, events=events)
         self.underlying = underlying
         self.strike = strike
+        self.draw_fundamentals()
+
+    def draw_fundamentals(self) -> None:
+        """Derives theo and settlement from the underlying."""
         self.theo = self.calc_option_theo()
-        self.iterations = self.underlying.iterations
+        self.settlement = self.calc_option_price(self.underlying.settlement)
+
+    def calc_theo(self) -> float:
+        """Recalculate theo from the underlying."""
+        return self.calc_option_theo()
 
     def calc_option_theo(self) -> float:
-        """Calculate theoretical value of option."""
-        raise NotImplementedError
+        """Calculate theoretical value of option over the underlying's remaining std."""
+        return float(option_theo(self.underlying.theo, self.strike, self.underlying.remaining_std, self.is_call))
     
-    def calc_option_price(self) -> float:
-        """Calculate option price."""
-        raise NotImplementedError
+    @abstractmethod
+    def calc_option_price(self, underlying_price: float) -> float:
+        """Calculate option payoff for a given underlying price."""
+
+    def generate_quote(self, i: int):
+        """Generates a quote for the option, floored at one tick."""
+        quote = super().generate_quote(i)
+        quote.price = max(quote.price, self.min_price)
+        return quote
 
 class Call(Option):
-    def __init__(self) -> None:
-        super().__init__()
-        self.theo = self.calc_option_theo()
-        self.name = f"{self.underlying.label} {self.strike} Call"
-        self.label = f"{self.underlying.label}{self.strike}c"
+    is_call = True
+    suffix = "Call"
 
-    def calc_option_theo(self) -> float:
-        """Calculate theoretical value of call option."""
-        return max(self.underlying.theo - self.strike, 0)
-    
-    def calc_option_price(self) -> float:
-        """Calculate option price."""
-        raise NotImplementedError
+    def calc_option_price(self, underlying_price: float) -> float:
+        """Calculate call payoff for a given underlying price."""
+        return max(underlying_price - self.strike, 0)
     
 class Put(Option):
-    def __init__(self) -> None:
-        super().__init__()
-        self.theo = self.calc_option_theo()
-        self.name = f"{self.underlying.label} {self.strike} Put"
-        self.label = f"{self.underlying.label}{self.strike}p"
+    is_call = False
+    suffix = "Put"
 
-    def calc_option_theo(self) -> float:
-        """Calculate theoretical value of put option."""
-        return max(self.strike - self.underlying.theo, 0)
-    
-    def calc_option_price(self) -> float:
-        """Calculate option price."""
-        raise NotImplementedError
+    def calc_option_price(self, underlying_price: float) -> float:
+        """Calculate put payoff for a given underlying price."""
+        return max(self.strike - underlying_price, 0)
+
+class OptionChain:
+    """Reprices a set of options, across any number of underlyings, in one vectorised call."""
+    def __init__(self, options: list[Option]) -> None:
+        self.options = options
+        self.underlyings = list({id(o.underlying): o.underlying for o in options}.values())
+        index = {id(u): k for k, u in enumerate(self.underlyings)}
+        self.underlying_idx = np.array([index[id(o.underlying)] for o in options], dtype=np.intp)
+        self.strikes = np.array([o.strike for o in options], dtype=float)
+        self.is_call = np.array([o.is_call for o in options], dtype=bool)
+
+    @classmethod
+    def listed(cls, underlying: Book, strikes, kinds: tuple = (Call, Put), **kwargs) -> 'OptionChain':
+        """Lists every kind of option at every strike on one underlying."""
+        return cls([kind(underlying, strike, **kwargs) for strike in strikes for kind in kinds])
+
+    def reprice(self) -> np.ndarray:
+        """Updates every option's theo from its underlying's current theo and remaining std."""
+        forwards = np.array([u.theo for u in self.underlyings], dtype=float)[self.underlying_idx]
+        stds = np.array([u.remaining_std for u in self.underlyings], dtype=float)[self.underlying_idx]
+        theos = option_theo(forwards, self.strikes, stds, self.is_call)
+        for o, theo in zip(self.options, theos.tolist()):
+            o.theo = theo
+        return theos
+
+def combo_label(legs: list[tuple[Book, float]], attr: str = 'label', sep: str = '') -> str:
+    """Builds a name like 'a-b' or '2a-b+c' from (book, weight) legs."""
+    parts = []
+    for k, (book, weight) in enumerate(legs):
+        sign = '-' if weight < 0 else ('+' if k else '')
+        size = '' if abs(weight) == 1 else f"{abs(weight):g}"
+        parts.append(f"{sign}{sep}{size}{getattr(book, attr)}" if k else f"{sign}{size}{getattr(book, attr)}")
+    return sep.join(parts)
+
+class Spread(Book):
+    """A tradable linear combination of outright books.
+    Theo and settlement are the weighted sums of the legs'. Quote noise defaults
+    to the legs' noise combined as if independent.
+    """
+    def __init__(self, legs: list[tuple[Book, float]], name: str = None, label: str = None,
+                 std_min: float = None, std_max: float = None, cross_prob: float = None,
+                 depth: int = None, verbose: bool = True, events: EventBus = None) -> None:
+        first = legs[0][0]
+        super().__init__(
+            name=name or combo_label(legs, 'name', ' '),
+            label=label or combo_label(legs),
+            iterations=first.iterations,
+            std_min=np.sqrt(sum((w * b.std_min) ** 2 for b, w in legs)) if std_min is None else std_min,
+            std_max=np.sqrt(sum((w * b.std_max) ** 2 for b, w in legs)) if std_max is None else std_max,
+            theo_min=0, theo_max=0,
+            settlement_std=np.sqrt(sum((w * b.settlement_std) ** 2 for b, w in legs)),
+            cross_prob=first.cross_prob if cross_prob is None else cross_prob,
+            depth=first.depth if depth is None else depth,
+            verbose=verbose, events=events)
+        self.legs = legs
+        self.draw_fundamentals()
+
+    def draw_fundamentals(self) -> None:
+        """Derives theo and settlement from the legs."""
+        self.theo = self.calc_theo()
+        self.settlement = sum(w * b.settlement for b, w in self.legs)
+
+    def calc_theo(self) -> float:
+        """Recalculate theo from the legs."""
+        return sum(w * b.theo for b, w in self.legs)
+
+class ComboChain:
+    """Vectorised theo and implied prices for many spreads over shared outrights.
+    Spreads are rows of a weight matrix over the distinct outright legs.
+    Market uses it to reprice spread theos each iteration. implied_prices is an
+    analytic only: spread bots do not quote off it, and it implies spread prices
+    from the legs but not outright prices from resting spread orders.
+    """
+    def __init__(self, spreads: list[Spread]) -> None:
+        self.spreads = spreads
+        self.outrights = list({id(b): b for s in spreads for b, _ in s.legs}.values())
+        index = {id(b): k for k, b in enumerate(self.outrights)}
+        self.weights = np.zeros((len(spreads), len(self.outrights)))
+        for r, s in enumerate(spreads):
+            for b, w in s.legs:
+                self.weights[r, index[id(b)]] += w
+        self.long = np.maximum(self.weights, 0)
+        self.short = np.minimum(self.weights, 0)
+
+    def reprice(self) -> np.ndarray:
+        """Updates every spread's theo from its legs' current theos."""
+        theos = self.weights @ np.array([b.theo for b in self.outrights], dtype=float)
+        for s, theo in zip(self.spreads, theos.tolist()):
+            s.theo = theo
+        return theos
+
+    def implied_prices(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the bid and offer implied for each spread by trading its legs outright.
+        Selling a spread sells the long legs at their bids and buys the short legs at
+        their offers (and the reverse for buying). NaN where a needed side is empty.
+        Top of book only: sizes and the spread books' own orders are not considered.
+        """
+        bids = np.array([b.bids.best() if b.bids else np.nan for b in self.outrights], dtype=float)
+        offers = np.array([b.offers.best() if b.offers else np.nan for b in self.outrights], dtype=float)
+        no_bid, no_offer = np.isnan(bids), np.isnan(offers)
+        bids, offers = np.nan_to_num(bids), np.nan_to_num(offers)
+
+        implied_bid = self.long @ bids + self.short @ offers
+        implied_offer = self.long @ offers + self.short @ bids
+        implied_bid[((self.long > 0) @ no_bid + (self.short < 0) @ no_offer) > 0] = np.nan
+        implied_offer[((self.long > 0) @ no_offer + (self.short < 0) @ no_bid) > 0] = np.nan
+        return implied_bid, implied_offer
 
 if __name__ == '__main__':
     iterations = 20
 
-    future_a = Book(
-        name='Future A', label='a', iterations=iterations, 
-        std_min=5, std_max=50, theo_min=100, theo_max=250,
-        settlement_std=25, cross_prob = 0.4
-    )
-    call_a = Call(underlying = future_a, strike=100)
-
-    future_b = Book(
-        name='Future B', label='b', iterations=iterations, 
-        std_min=5, std_max=50, theo_min=100, theo_max=250,
-        settlement_std=25, cross_prob = 0.4
-    )
-    books = [future_a, future_b]
+    future_a, future_b = make_books(2, iterations, verbose=True)
+    call_a = Call(underlying = future_a, strike=150)
+    books = [future_a, call_a, future_b]
 
     t = Trader(books=books, name='Warren Buffet')
-    m = Market(books=books, trader=t)
+    m = Market(books=books, trader=t, iterations=iterations)
     m.start()
 
     t.reconcile()
\ No newline at end of file
@@ -0,0 +1,282 @@
+import functools
+import numpy as np
+from mock_bot import Book, Market, Option, Spread, option_theo
+
+def derive_fundamentals(books: list[Book], theo: np.ndarray, settlement: np.ndarray) -> None:
+    """Overwrites the (N, B) theo and settlement columns of options and spreads with
+    values derived from their underlyings' and legs' columns, as Option and Spread
+    draw_fundamentals do. Raises ValueError if an underlying or leg is not in books.
+    """
+    index = {id(b): j for j, b in enumerate(books)}
+
+    def column(book: Book) -> int:
+        j = index.get(id(book))
+        if j is None:
+            raise ValueError(f"{book.name} is derived from in the session but is not one of its books")
+        return j
+
+    # Outrights first, so options and spreads of derived books see final columns
+    for j in sorted(range(len(books)), key=lambda j: isinstance(books[j], (Option, Spread))):
+        b = books[j]
+        if isinstance(b, Option):
+            u = column(b.underlying)
+            theo[:, j] = option_theo(theo[:, u], b.strike, b.underlying.settlement_std, b.is_call)
+            payoff = settlement[:, u] - b.strike
+            settlement[:, j] = np.maximum(payoff if b.is_call else -payoff, 0)
+        elif isinstance(b, Spread):
+            legs = [(column(leg), w) for leg, w in b.legs]
+            theo[:, j] = sum(w * theo[:, k] for k, w in legs)
+            settlement[:, j] = sum(w * settlement[:, k] for k, w in legs)
+
+def draw_sessions(books: list[Book], n_sessions: int, iterations: int, scale: float = 2,
+                  rng: np.random.Generator = None) -> dict:
+    """Draw every random input for n_sessions independent sessions up front.
+    Args:
+        books (list[Book]): Template books. Only their parameters are used. Options
+            and spreads take their theos and settlements from their underlyings and
+            legs, which must be among books.
+        n_sessions (int): Number of sessions.
+        iterations (int): Number of iterations per session.
+        scale (float): Exponential scale used by calc_n_quotes.
+        rng (np.random.Generator): Source of randomness. Defaults to a fresh Generator.
+    Returns:
+        dict: Arrays of theos/settlements (N, B) and quote inputs (N, I, B).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    n_books = len(books)
+    shape = (n_sessions, iterations, n_books)
+    theo_min = np.array([b.theo_min for b in books], dtype=float)
+    theo_max = np.array([b.theo_max for b in books], dtype=float)
+    settlement_std = np.array([b.settlement_std for b in books], dtype=float)
+    cross_prob = np.array([b.cross_prob for b in books], dtype=float)
+
+    theo = rng.uniform(theo_min, theo_max, size=(n_sessions, n_books))
+    settlement = rng.normal(theo, settlement_std)
+    derive_fundamentals(books, theo, settlement)
+
+    # calc_n_quotes for every iteration, then a random subset of that many books
+    n_quotes = np.minimum(np.ceil(rng.exponential(scale=scale, size=shape[:2])), n_books)
+    rank = rng.uniform(size=shape).argsort(axis=-1).argsort(axis=-1)
+    quoting = rank < n_quotes[..., None]
+
+    # Book.calc_decayed_var for every book and iteration
+    std_min = np.array([b.std_min for b in books], dtype=float)
+    std_max = np.array([b.std_max for b in books], dtype=float)
+    book_its = np.array([b.iterations for b in books], dtype=float)
+    std = std_max - np.arange(iterations)[:, None] * (std_max - std_min) / book_its
+
+    raw_price = rng.normal(theo[:, None, :], std, size=shape)
+    cross = rng.uniform(size=shape) < cross_prob
+    # Book.generate_quote: bid below theo unless the bot crosses itself
+    is_bid = (raw_price < theo[:, None, :]) != cross
+    # Option.generate_quote floors prices at min_price once the side is chosen
+    floor = np.array([-np.inf if b.min_price is None else b.min_price for b in books], dtype=float)
+
+    return {
+        "theo": theo,
+        "settlement": settlement,
+        "quoting": quoting,
+        "price": np.maximum(np.round(raw_price), floor),
+        "is_bid": is_bid,
+        "cross": cross,
+        "botted": np.array([bool(b.bots) for b in books]),
+    }
+
+def _remove(levels: np.ndarray, mask: np.ndarray, idx: np.ndarray, empty: float) -> None:
+    """Clear slot idx of every masked session."""
+    rows = np.flatnonzero(mask)
+    levels[rows, idx[rows]] = empty
+
+def _apply_quotes(bid_lv: np.ndarray, off_lv: np.ndarray, quoting: np.ndarray, price: np.ndarray,
+                  is_bid: np.ndarray) -> None:
+    """Processes at most one unit quote per session against one book's slot arrays."""
+    bid_side = quoting & is_bid
+    off_side = quoting & ~is_bid
+
+    # Book.process_quote: a crossing quote takes out the top of book
+    lift = bid_side & (price > off_lv.min(axis=1))
+    hit = off_side & (price < bid_lv.max(axis=1))
+    _remove(off_lv, lift, off_lv.argmin(axis=1), np.inf)
+    _remove(bid_lv, hit, bid_lv.argmax(axis=1), -np.inf)
+
+    # Book.append: fill an empty slot, then Book.clean drops the worst level
+    for lv, add, empty, worst in ((bid_lv, bid_side & ~lift, -np.inf, np.argmin),
+                                  (off_lv, off_side & ~hit, np.inf, np.argmax)):
+        rows = np.flatnonzero(add)
+        if not len(rows):
+            continue
+        slot = (lv[rows] == empty).argmax(axis=1)
+        lv[rows, slot] = price[rows]
+        full = rows[(lv[rows] != empty).all(axis=1)]
+        lv[full, worst(lv[full], axis=1)] = empty
+
+def quote_step(draws: dict, i: int, bids: list, offers: list, best_bid: np.ndarray,
+               best_offer: np.ndarray) -> None:
+    """Processes iteration i's drawn quotes in every session and refreshes the best
+    bid and offer. Books with bots are left to bot_step.
+    """
+    for j in range(len(bids)):
+        if draws["botted"][j]:
+            continue
+        _apply_quotes(bids[j], offers[j], draws["quoting"][:, i, j], draws["price"][:, i, j],
+                      draws["is_bid"][:, i, j])
+        best_bid[:, j] = bids[j].max(axis=1)
+        best_offer[:, j] = offers[j].min(axis=1)
+
+def bot_step(books: list[Book], draws: dict, i: int, bids: list, offers: list, best_bid: np.ndarray,
+             best_offer: np.ndarray, position: np.ndarray, prev_mid: np.ndarray) -> None:
+    """Quotes iteration i for the books with bots, as Market.bot_quotes does for one
+    session: each Bot is called once per book, with one state row per session quoting
+    that book, and quotes are processed in the bots' order. The slot engine is unit
+    size, so quote quantities are ignored. The bots' inventory is minus the user's
+    position, and prev_mid is updated in place.
+    """
+    for j, b in enumerate(books):
+        if not b.bots:
+            continue
+        rows = np.flatnonzero(draws["quoting"][:, i, j])
+        n = len(rows)
+        if not n:
+            continue
+        bid = np.where(np.isfinite(best_bid[rows, j]), best_bid[rows, j], np.nan)
+        offer = np.where(np.isfinite(best_offer[rows, j]), best_offer[rows, j], np.nan)
+        mid = np.where(np.isnan(bid), offer, np.where(np.isnan(offer), bid, (bid + offer) / 2))
+        state = {
+            "theo": draws["theo"][rows, j], "std": np.full(n, b.calc_decayed_var(i)),
+            "cross_prob": np.full(n, b.cross_prob), "max_qty": np.full(n, b.max_qty),
+            "best_bid": bid, "best_offer": offer, "mid": mid, "prev_mid": prev_mid[rows, j],
+            "inventory": -position[rows, j],
+        }
+        prev_mid[rows, j] = mid
+
+        quotes = [bot.quote(state, i) for bot in b.bots]
+        row = np.concatenate([np.asarray(q[0], dtype=np.int64) for q in quotes])
+        price = np.concatenate([np.asarray(q[1], dtype=float) for q in quotes])
+        side = np.concatenate([np.asarray(q[2]) for q in quotes])
+        if b.min_price is not None:
+            price = np.maximum(price, b.min_price)
+        price = np.round(price)
+
+        # Rank each quote among its session's, then apply one rank at a time, in order
+        order = np.argsort(row, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(row[order]) != 0])
+        rank = np.empty(len(row), dtype=np.int64)
+        rank[order] = np.arange(len(row)) - np.repeat(starts, np.diff(np.r_[starts, len(row)]))
+        n_sessions = len(best_bid)
+        for r in range(rank.max(initial=-1) + 1):
+            sel = rank == r
+            sessions = rows[row[sel]]
+            quoting = np.zeros(n_sessions, dtype=bool)
+            quoting[sessions] = True
+            full_price = np.zeros(n_sessions)
+            full_price[sessions] = price[sel]
+            is_bid = np.zeros(n_sessions, dtype=bool)
+            is_bid[sessions] = side[sel] > 0
+            _apply_quotes(bids[j], offers[j], quoting, full_price, is_bid)
+        best_bid[:, j] = bids[j].max(axis=1)
+        best_offer[:, j] = offers[j].min(axis=1)
+
+def seed_bots(books: list[Book], rng: np.random.Generator) -> None:
+    """Gives every template book's bots a Generator spawned from rng."""
+    for b in books:
+        for bot, child in zip(b.bots, rng.spawn(len(b.bots))):
+            bot.seed(child)
+
+def action_step(actions: np.ndarray, bids: list, offers: list, best_bid: np.ndarray,
+                best_offer: np.ndarray, position: np.ndarray, cash: np.ndarray,
+                fills: np.ndarray) -> None:
+    """Applies (N, B) hit (-1) / lift (1) actions against the top of every book."""
+    for j in range(len(bids)):
+        # Book.process_action: trade against the top of book if there is one
+        sell = (actions[:, j] < 0) & np.isfinite(best_bid[:, j])
+        buy = (actions[:, j] > 0) & np.isfinite(best_offer[:, j])
+        _remove(bids[j], sell, bids[j].argmax(axis=1), -np.inf)
+        _remove(offers[j], buy, offers[j].argmin(axis=1), np.inf)
+        cash[:, j] += np.where(sell, best_bid[:, j], 0) - np.where(buy, best_offer[:, j], 0)
+        position[:, j] += buy.astype(np.int64) - sell
+        fills[:, j] += buy | sell
+
+def simulate_sessions(books: list[Book], n_sessions: int, iterations: int, policy=None,
+                      seed: int = None) -> dict:
+    """Simulate n_sessions independent Market sessions at once.
+
+    Each book side is a (N, depth + 1) slot array, empty slots holding -inf for
+    bids and inf for offers. Iterations and books are looped in Python, every
+    operation inside is vectorised across sessions. Books with bots quote through
+    them, each Bot called once per iteration with a row per session (see bot_step).
+
+    Args:
+        books (list[Book]): Template books (parameters and depth).
+        n_sessions (int): Number of sessions.
+        iterations (int): Number of iterations per session.
+        policy (callable): Called as policy(state, i) after each iteration's quotes.
+            Returns an (N, B) array of -1 (hit), 0 (no action) or 1 (lift), or None.
+            state holds 'best_bid', 'best_offer', 'position' and 'theo' as (N, B) arrays.
+        seed (int): Seed for the batch's Generator.
+    Returns:
+        dict: Per-session 'pnl' (N,) and per-book 'book_pnl', 'position', 'fills',
+            'theo' and 'settlement' (N, B) arrays.
+    """
+    rng = np.random.default_rng(seed)
+    draws = draw_sessions(books, n_sessions, iterations, rng=rng)
+    seed_bots(books, rng)
+    n_books = len(books)
+    bids = [np.full((n_sessions, b.depth + 1), -np.inf) for b in books]
+    offers = [np.full((n_sessions, b.depth + 1), np.inf) for b in books]
+    position = np.zeros((n_sessions, n_books), dtype=np.int64)
+    cash = np.zeros((n_sessions, n_books))
+    fills = np.zeros((n_sessions, n_books), dtype=np.int64)
+    best_bid = np.full((n_sessions, n_books), -np.inf)
+    best_offer = np.full((n_sessions, n_books), np.inf)
+    prev_mid = np.full((n_sessions, n_books), np.nan)
+
+    for i in range(iterations):
+        quote_step(draws, i, bids, offers, best_bid, best_offer)
+        bot_step(books, draws, i, bids, offers, best_bid, best_offer, position, prev_mid)
+        if policy is None:
+            continue
+        actions = policy({"best_bid": best_bid, "best_offer": best_offer,
+                          "position": position, "theo": draws["theo"]}, i)
+        if actions is not None:
+            action_step(actions, bids, offers, best_bid, best_offer, position, cash, fills)
+
+    book_pnl = draws["settlement"] * position + cash
+    return {
+        "pnl": book_pnl.sum(axis=1),
+        "book_pnl": book_pnl,
+        "position": position,
+        "fills": fills,
+        "theo": draws["theo"],
+        "settlement": draws["settlement"],
+    }
+
+def _edge_policy(state: dict, i: int, edge: float) -> np.ndarray:
+    lift = state["best_offer"] < state["theo"] - edge
+    hit = state["best_bid"] > state["theo"] + edge
+    return lift.astype(int) - hit
+
+def edge_policy(edge: float = 5):
+    """Example policy: lift offers below theo - edge, hit bids above theo + edge."""
+    return functools.partial(_edge_policy, edge=edge)
+
+def _policy_strategy(policy, market: Market, i: int) -> list[str]:
+    books = market.books
+    position = {b.label: 0 for b in books}
+    for label, v in market.trader.log.items():
+        position[label] = v["position"]
+    state = {
+        "best_bid": np.array([[b.bids.best() if b.bids else -np.inf for b in books]]),
+        "best_offer": np.array([[b.offers.best() if b.offers else np.inf for b in books]]),
+        "position": np.array([[position[b.label] for b in books]]),
+        "theo": np.array([[b.theo for b in books]]),
+    }
+    actions = policy(state, i)
+    if actions is None:
+        return []
+    return [('l' if a > 0 else 'h') + b.label for a, b in zip(actions[0], books) if a]
+
+def as_strategy(policy):
+    """Adapt a vectorised policy into a Market.run strategy for a single session.
+    Both are partials of module-level functions, so they pickle into worker processes.
+    """
+    return functools.partial(_policy_strategy, policy)
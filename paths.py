@@ -0,0 +1,37 @@
+import numpy as np
+
+def theo_paths(start, iterations: int, vol, corr=None, jump_prob: float = 0.0, jump_std: float = 0.0,
+               n_sessions: int = None, rng: np.random.Generator = None) -> np.ndarray:
+    """Correlated random-walk theo paths for B books, optionally with jumps,
+    generated for every book, iteration (and session) in one pass.
+    Args:
+        start: (B,) starting theos, or (N, B) with n_sessions.
+        iterations (int): Number of iterations.
+        vol: Std of each book's per-iteration diffusive step, scalar or (B,).
+        corr: (B, B) correlation matrix of the steps, applied through its Cholesky factor.
+            None for independent books.
+        jump_prob (float): Probability of a jump per book and iteration.
+        jump_std (float): Std of jump sizes. Jumps are independent across books.
+        n_sessions (int): Number of independent sessions, or None for one.
+        rng (np.random.Generator): Source of randomness.
+    Returns:
+        np.ndarray: (iterations + 1, B) paths, or (N, iterations + 1, B). Row i is the
+            theo during iteration i and the last row is the settlement.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    start = np.asarray(start, dtype=float)
+    n_books = start.shape[-1]
+    shape = (iterations, n_books) if n_sessions is None else (n_sessions, iterations, n_books)
+
+    steps = rng.standard_normal(shape)
+    if corr is not None:
+        steps = steps @ np.linalg.cholesky(np.asarray(corr, dtype=float)).T
+    steps *= np.broadcast_to(np.asarray(vol, dtype=float), (n_books,))
+    if jump_prob:
+        steps += (rng.random(shape) < jump_prob) * rng.normal(0, jump_std, shape)
+
+    paths = np.empty(shape[:-2] + (iterations + 1, n_books))
+    paths[..., 0, :] = start
+    np.cumsum(steps, axis=-2, out=paths[..., 1:, :])
+    paths[..., 1:, :] += start[..., None, :]
+    return paths
@@ -0,0 +1,148 @@
+import cProfile
+import io
+import pstats
+from events import EventType
+
+SUB_BITS = 5  # 32 sub-buckets per power of two, about 3% relative precision
+SUB_COUNT = 1 << SUB_BITS
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of nanosecond latencies.
+
+    Values below 2 * SUB_COUNT get a bucket each; above that every power of two
+    is split into SUB_COUNT equal buckets, so recording is O(1) and memory is
+    fixed no matter how many values are recorded.
+    """
+    def __init__(self) -> None:
+        self.counts = [0] * (64 * SUB_COUNT)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        shift = max(value.bit_length() - SUB_BITS - 1, 0)
+        return shift * SUB_COUNT + (value >> shift)
+
+    @staticmethod
+    def bucket_high(index: int) -> int:
+        """Highest value that falls in bucket index."""
+        shift = max(index // SUB_COUNT - 1, 0)
+        return ((index - shift * SUB_COUNT + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(value, 0)
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """Value at percentile q (0-100), accurate to the bucket width."""
+        if not self.count:
+            return 0
+        target = max(q / 100 * self.count, 1)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.bucket_high(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict:
+        return {"count": self.count, "mean": self.mean(), "p50": self.percentile(50),
+                "p99": self.percentile(99), "p99.9": self.percentile(99.9), "max": self.max}
+
+class CounterSink:
+    """EventBus sink counting events per book and type."""
+    def __init__(self) -> None:
+        self.counts = {}
+
+    def write(self, event) -> None:
+        key = (event.book, event.type)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def close(self) -> None:
+        pass
+
+class Profiler:
+    """Per-stage and per-book latency histograms, event counters and an optional
+    cProfile of a whole session.
+
+    Market only times its stages when it holds a Profiler, so a session without
+    one pays a single None check per stage.
+    """
+    def __init__(self, cprofile: bool = False) -> None:
+        self.stages = {}
+        self.book_stages = {}
+        self.counters = CounterSink()
+        self.profile = cProfile.Profile() if cprofile else None
+        self._buses = []
+
+    def record(self, stage: str, ns: int, book: str = None) -> None:
+        """Records ns nanoseconds spent in stage, also against book if given."""
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = LatencyHistogram()
+        hist.record(ns)
+        if book is not None:
+            key = (stage, book)
+            hist = self.book_stages.get(key)
+            if hist is None:
+                hist = self.book_stages[key] = LatencyHistogram()
+            hist.record(ns)
+
+    def attach(self, books: list) -> None:
+        """Counts the books' events, once per distinct EventBus."""
+        for b in books:
+            if all(bus is not b.events for bus in self._buses):
+                b.events.add_sink(self.counters)
+                self._buses.append(b.events)
+
+    def detach(self) -> None:
+        for bus in self._buses:
+            bus.remove_sink(self.counters)
+        self._buses = []
+
+    def start(self) -> None:
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+
+    def report(self, top: int = 15) -> str:
+        """Latency percentiles per stage and book, event counts and the cProfile top functions."""
+        lines = ["Latency (us):", f"{'stage':<24}{'count':>9}{'mean':>10}{'p50':>10}{'p99':>10}{'p99.9':>10}{'max':>10}"]
+        rows = [(stage, h) for stage, h in self.stages.items()]
+        rows += [(f"  {stage} [{book}]", h) for (stage, book), h in self.book_stages.items()]
+        for name, h in rows:
+            s = h.summary()
+            lines.append(f"{name:<24}{s['count']:>9}" + "".join(
+                f"{s[k] / 1000:>10.1f}" for k in ("mean", "p50", "p99", "p99.9", "max")))
+
+        books = sorted({book for book, _ in self.counters.counts})
+        if books:
+            types = [EventType.QUOTE, EventType.HIT, EventType.LIFT, EventType.CANCEL, EventType.FILL, EventType.ORDER]
+            names = ["quotes", "hits", "lifts", "cancels", "fills", "orders"]
+            lines += ["Events:", f"{'book':<24}" + "".join(f"{n:>9}" for n in names)]
+            for book in books:
+                lines.append(f"{book:<24}" + "".join(
+                    f"{self.counters.counts.get((book, t), 0):>9}" for t in types))
+
+        if self.profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(top)
+            lines.append(out.getvalue())
+        return "\n".join(lines)
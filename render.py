@@ -0,0 +1,79 @@
+import shutil
+import sys
+
+CELL = 7
+
+class LadderRenderer:
+    """Fixed-layout terminal ladder for a set of books, redrawn incrementally.
+
+    Each book gets a column with its best `depth` offers above its best `depth`
+    bids. Books report changes through Book.listeners, and render() only
+    rewrites the cells of changed books whose text differs from the last frame.
+    """
+    def __init__(self, books: list, depth: int = 5, stream=None, top: int = 1) -> None:
+        self.books = books
+        self.depth = depth
+        self.stream = stream or sys.stdout
+        self.top = top
+        self.height = 2 * depth + 1
+        self._cells = {}
+        self._dirty = set(range(len(books)))
+        self._index = {id(b): k for k, b in enumerate(books)}
+        for b in books:
+            b.listeners.append(self._on_change)
+
+    def _on_change(self, book) -> None:
+        self._dirty.add(self._index[id(book)])
+
+    def _col(self, k: int) -> int:
+        """Screen column of book k's bid cell."""
+        return 1 + k * (2 * CELL + 4)
+
+    def open(self) -> None:
+        """Clears the screen, draws the static frame and scrolls other output below the ladder."""
+        rows = shutil.get_terminal_size().lines
+        out = ["\x1b[2J"]
+        for k, b in enumerate(self.books):
+            col = self._col(k)
+            out.append(f"\x1b[{self.top};{col}H{b.name[:CELL]:>{CELL}} {b.label[:CELL]:>{CELL}}")
+            for r in range(2 * self.depth):
+                out.append(f"\x1b[{self.top + 1 + r};{col + CELL + 1}H|")
+        for k in range(len(self.books)):
+            for r in range(2 * self.depth):
+                for c in (0, CELL + 2):
+                    self._cells[(self.top + 1 + r, self._col(k) + c)] = ""
+        # Keep the ladder fixed and let prints and prompts scroll underneath
+        out.append(f"\x1b[{self.top + self.height + 1};{rows}r\x1b[{rows};1H")
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self._dirty = set(range(len(self.books)))
+
+    def close(self) -> None:
+        """Stops listening to the books and restores the full-screen scroll region."""
+        for b in self.books:
+            b.listeners.remove(self._on_change)
+        self.stream.write("\x1b[r")
+        self.stream.flush()
+
+    def render(self) -> int:
+        """Redraws the changed cells of changed books. Returns the number of cells written."""
+        out = []
+        for k in sorted(self._dirty):
+            book = self.books[k]
+            col = self._col(k)
+            offers = book.offers.top(self.depth)[::-1]
+            bids = book.bids.top(self.depth)
+            offers = [""] * (self.depth - len(offers)) + offers
+            bids = bids + [""] * (self.depth - len(bids))
+            for r, (bid, offer) in enumerate(zip([""] * self.depth + bids, offers + [""] * self.depth)):
+                row = self.top + 1 + r
+                for c, text in ((col, str(bid)), (col + CELL + 2, str(offer))):
+                    if self._cells.get((row, c)) != text:
+                        self._cells[(row, c)] = text
+                        out.append(f"\x1b[{row};{c}H{text:>{CELL}}")
+        self._dirty.clear()
+        if out:
+            # Save and restore the cursor so any prompt below is left where it was
+            self.stream.write("\x1b7" + "".join(out) + "\x1b8")
+            self.stream.flush()
+        return len(out)
@@ -0,0 +1,187 @@
+import numpy as np
+from mock_bot import Book, Option, Spread, Trader
+
+class RiskEngine:
+    """Live scenario risk of a Trader's positions across its books.
+
+    Settlements are sampled once as a cached matrix of standard normals over the
+    outright books, optionally correlated, and every book's settlement in a
+    scenario is derived from them: outrights settle at theo + settlement_std * z,
+    options at their payoff on the underlying and spreads at their weighted legs.
+
+    The engine keeps the scenario PnL of the current positions as one vector and
+    updates it incrementally: a fill adds its position change times the book's
+    scenario column, and theo moves of linear books (outrights and spreads of
+    them) shift every scenario equally, so only option columns are recomputed,
+    and only when their underlying moved.
+    """
+    def __init__(self, trader: Trader, n_scenarios: int = 100000, corr=None, alpha: float = 0.99,
+                 rng: np.random.Generator = None) -> None:
+        """
+        Args:
+            trader (Trader): Whose positions to evaluate.
+            n_scenarios (int): Number of sampled settlements.
+            corr: Correlation matrix of the outrights' settlements, in self.outrights
+                order, or None for independent books.
+            alpha (float): VaR / expected shortfall confidence level.
+            rng (np.random.Generator): Source of the scenarios.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        self.trader = trader
+        self.books = [v['book'] for v in trader.log.values()]
+        self.alpha = alpha
+        self.n_scenarios = n_scenarios
+
+        outrights = {}
+        def collect(b):
+            if isinstance(b, Option):
+                collect(b.underlying)
+            elif isinstance(b, Spread):
+                for leg, _ in b.legs:
+                    collect(leg)
+            else:
+                outrights[id(b)] = b
+        for b in self.books:
+            collect(b)
+        self.outrights = list(outrights.values())
+        self._index = {key: k for k, key in enumerate(outrights)}
+        self.std = np.array([b.settlement_std for b in self.outrights], dtype=float)
+
+        z = rng.standard_normal((n_scenarios, len(self.outrights)))
+        if corr is not None:
+            z = z @ np.linalg.cholesky(np.asarray(corr, dtype=float)).T
+        # One contiguous row per outright, so a book's column is a cheap slice; scaled
+        # by settlement_std up front so settling an outright is a single add
+        self.dz = np.ascontiguousarray(z.T) * self.std[:, None]
+
+        self.linear = {b.label: self._is_linear(b) for b in self.books}
+        # Outright indices each non-linear book depends on; its column is keyed on their theos
+        self._deps = {b.label: np.array(sorted(set(self._outright_idx(b))), dtype=np.intp)
+                      for b in self.books if not self.linear[b.label]}
+        self._shapes = {}   # label -> scenario column of a linear book, less its theo
+        self._columns = {}  # label -> (scenario column, its outrights' theos when built) for others
+        self._means = {}    # label -> mean of the book's cached column
+        self.positions = {b.label: 0 for b in self.books}
+        self.value = np.zeros(n_scenarios)  # sum of position * cached column over books
+        self._theos = self.theos()
+
+    def _is_linear(self, book: Book) -> bool:
+        if isinstance(book, Option):
+            return False
+        if isinstance(book, Spread):
+            return all(self._is_linear(leg) for leg, _ in book.legs)
+        return True
+
+    def _outright_idx(self, book: Book) -> list[int]:
+        if isinstance(book, Option):
+            return self._outright_idx(book.underlying)
+        if isinstance(book, Spread):
+            return [k for leg, _ in book.legs for k in self._outright_idx(leg)]
+        return [self._index[id(book)]]
+
+    def theos(self) -> np.ndarray:
+        return np.array([b.theo for b in self.outrights], dtype=float)
+
+    def settle(self, book: Book, theos: np.ndarray) -> np.ndarray:
+        """The book's settlement in every scenario, given the outrights' theos."""
+        if isinstance(book, Option):
+            s = self.settle(book.underlying, theos)  # always a fresh array, so work in place
+            if book.is_call:
+                s -= book.strike
+            else:
+                np.subtract(book.strike, s, out=s)
+            return np.maximum(s, 0, out=s)
+        if isinstance(book, Spread):
+            return sum(w * self.settle(leg, theos) for leg, w in book.legs)
+        k = self._index[id(book)]
+        return theos[k] + self.dz[k]
+
+    def offset(self, book: Book, theos: np.ndarray) -> float:
+        """The theo part of a linear book's settlement, common to every scenario."""
+        if isinstance(book, Spread):
+            return sum(w * self.offset(leg, theos) for leg, w in book.legs)
+        return float(theos[self._index[id(book)]])
+
+    def column(self, book: Book, theos: np.ndarray) -> np.ndarray:
+        """The book's cached per-scenario column (less its theo for linear books)."""
+        if self.linear[book.label]:
+            shape = self._shapes.get(book.label)
+            if shape is None:
+                shape = self._shapes[book.label] = self.settle(book, np.zeros(len(self.outrights)))
+                self._means[book.label] = shape.mean()
+            return shape
+        cached = self._columns.get(book.label)
+        key = theos[self._deps[book.label]]
+        if cached is None or not np.array_equal(cached[1], key):
+            cached = self._columns[book.label] = (self.settle(book, theos), key)
+            self._means[book.label] = cached[0].mean()
+        return cached[0]
+
+    def update(self) -> None:
+        """Brings the scenario PnL vector up to date with theo moves and new fills."""
+        theos = self.theos()
+        if not np.array_equal(theos, self._theos):
+            for b in self.books:
+                pos = self.positions[b.label]
+                if pos and not self.linear[b.label]:
+                    old = self._columns[b.label][0]
+                    new = self.column(b, theos)
+                    if new is not old:
+                        # old is no longer cached, so its buffer takes the change
+                        np.subtract(new, old, out=old)
+                        old *= pos
+                        self.value += old
+            self._theos = theos
+
+        for label, v in self.trader.log.items():
+            change = v['position'] - self.positions[label]
+            if change:
+                self.value += change * self.column(v['book'], theos)
+                self.positions[label] = v['position']
+                if not v['position'] and not self.linear[label]:
+                    del self._columns[label]
+
+    def evaluate(self) -> dict:
+        """Scenario PnL of the current positions at settlement.
+        Returns:
+            dict: 'expected' PnL, 'var' and 'es' (expected shortfall) as positive losses
+                at alpha, 'std', and per book 'expected' and 'es' contributions, which
+                sum to the portfolio figures.
+        """
+        self.update()
+        theos = self._theos
+        offsets = {}
+        total_offset = 0.0
+        for b in self.books:
+            v = self.trader.log[b.label]
+            offsets[b.label] = v['cash'] + (v['position'] * self.offset(b, theos)
+                                            if self.linear[b.label] else 0.0)
+            total_offset += offsets[b.label]
+        pnl = self.value + total_offset
+
+        n_tail = max(int(round((1 - self.alpha) * self.n_scenarios)), 1)
+        tail = np.argpartition(pnl, n_tail - 1)[:n_tail]
+        books = {}
+        for b in self.books:
+            pos = self.positions[b.label]
+            column = self.column(b, theos) if pos else None
+            books[b.label] = {
+                "position": pos,
+                "expected": offsets[b.label] + (pos * self._means[b.label] if pos else 0.0),
+                "es": -(offsets[b.label] + (pos * column.take(tail).sum() / n_tail if pos else 0.0)),
+            }
+        expected = pnl.mean()
+        return {
+            "expected": expected,
+            # One pass for the second moment rather than pnl.std()'s three
+            "std": np.sqrt(max(np.dot(pnl, pnl) / self.n_scenarios - expected ** 2, 0.0)),
+            "var": -pnl[tail].max(),
+            "es": -pnl[tail].mean(),
+            "books": books,
+        }
+
+    def summary(self) -> str:
+        """One line of live risk for the console."""
+        r = self.evaluate()
+        return (f"E[PnL] {r['expected']:.2f}  VaR{self.alpha:.0%} {r['var']:.2f}  "
+                f"ES {r['es']:.2f}  std {r['std']:.2f}")
@@ -0,0 +1,115 @@
+import heapq
+import numpy as np
+from mock_bot import Market
+
+class PoissonProcess:
+    """Arrivals at a constant rate per unit of simulated time, with exponential gaps
+    drawn in blocks.
+    """
+    block_size = 256
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._gaps = []
+
+    def next_gap(self, rng: np.random.Generator) -> float:
+        if not self._gaps:
+            self._gaps = rng.exponential(1 / self.rate, self.block_size).tolist()
+        return self._gaps.pop()
+
+class FixedProcess:
+    """Arrivals every interval units of simulated time."""
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+
+    def next_gap(self, rng: np.random.Generator) -> float:
+        return self.interval
+
+class Simulation:
+    """Discrete-event run of a Market on a simulated clock.
+
+    Every book's bot and every scripted trader schedules its own next arrival on
+    one heap, and the clock jumps straight from event to event. Simulated time
+    maps onto the market's iterations (duration / iterations per iteration), so
+    quote noise decays and events are stamped as in Market.run. Any object with a
+    next_gap(rng) method can serve as an arrival process.
+    """
+    def __init__(self, market: Market, duration: float = None, quote_process=None,
+                 traders: list[tuple] = None) -> None:
+        """
+        Args:
+            market (Market): The session.
+            duration (float): Simulated session length. Defaults to one unit per iteration.
+            quote_process: Arrival process shared by every book's bot, or a dict of them by
+                book label. Defaults to a PoissonProcess(1) per book, one quote per unit.
+            traders (list[tuple]): Scripted traders as (strategy, process) or
+                (strategy, process, trader) tuples. strategy(market, i) returns actions
+                as for Market.run, applied for trader (default the market's trader).
+        """
+        self.market = market
+        self.duration = market.iterations if duration is None else duration
+        if quote_process is None:
+            quote_process = {b.label: PoissonProcess(1) for b in market.books}
+        elif not isinstance(quote_process, dict):
+            quote_process = {b.label: quote_process for b in market.books}
+        self.quote_processes = [quote_process[b.label] for b in market.books]
+        self.traders = [(t[0], t[1], t[2] if len(t) > 2 else market.trader) for t in traders or []]
+        self.time = 0.0
+        self.stats = {"events": 0, "quotes": 0, "trader_events": 0, "fills": 0}
+
+    def run(self, max_events: int = None) -> dict:
+        """Runs to the end of the session, or until max_events have been processed.
+        Returns:
+            dict: Event counts, the final simulated time and each trader's PnL by name.
+        """
+        market = self.market
+        books = market.books
+        n_books = len(books)
+        per_iteration = self.duration / market.iterations
+        last_iteration = market.iterations - 1
+        stats = self.stats
+
+        heap = []
+        for j, (b, process) in enumerate(zip(books, self.quote_processes)):
+            heap.append((process.next_gap(b.rng), j))
+        for k, (_, process, _) in enumerate(self.traders):
+            heap.append((process.next_gap(market.rng), n_books + k))
+        heapq.heapify(heap)
+
+        i = -1
+        budget = np.inf if max_events is None else max_events
+        while heap and stats["events"] < budget:
+            t, j = heap[0]
+            if t > self.duration:
+                break
+            self.time = t
+            stats["events"] += 1
+            it = min(int(t / per_iteration), last_iteration)
+            if it != i:
+                i = it
+                market.set_iteration(i)
+                if market.option_chain is not None:
+                    market.option_chain.reprice()
+                if market.combo_chain is not None:
+                    market.combo_chain.reprice()
+
+            if j < n_books:
+                b = books[j]
+                if b.bots:
+                    market.process_quotes(market.bot_quotes([j], i))
+                else:
+                    b.process_quote(b.generate_quote(i))
+                stats["quotes"] += 1
+                heapq.heapreplace(heap, (t + self.quote_processes[j].next_gap(b.rng), j))
+            else:
+                strategy, process, trader = self.traders[j - n_books]
+                actions = strategy(market, i)
+                if actions:
+                    stats["fills"] += market.process_actions([a for a in actions if market.input_valid(a)], trader)
+                stats["trader_events"] += 1
+                heapq.heapreplace(heap, (t + process.next_gap(market.rng), j))
+
+        traders = {id(trader): trader for _, _, trader in self.traders}
+        traders.setdefault(id(market.trader), market.trader)
+        return dict(stats, time=self.time,
+                    pnl={tr.name: tr.reconcile(verbose=False) for tr in traders.values()})
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import time
+import numpy as np
+from mock_bot import Book, Market, Trader, make_books
+from profiling import LatencyHistogram
+
+def encode(msg: dict) -> bytes:
+    return json.dumps(msg, separators=(',', ':')).encode() + b'\n'
+
+class Client:
+    """A connected trader: its stream, its own Trader ledger and how many of its
+    trades per book have been reported to it.
+    """
+    def __init__(self, client_id: int, name: str, writer: asyncio.StreamWriter, books: list[Book]) -> None:
+        self.id = client_id
+        self.name = name
+        self.writer = writer
+        self.trader = Trader(books, name=name)
+        self.reported = {b.label: 0 for b in books}
+
+class MarketServer:
+    """Runs one Market session for many trader clients over TCP.
+
+    Messages are newline-delimited JSON both ways. A client sends
+    {"type": "hello", "name": ...}, then {"type": "actions", "id": n, "actions": [...]}
+    in the terminal's action syntax ('ha', 'l5b', 'ba@120', 'c12'). The server sends
+    a 'welcome' snapshot, 'book' diffs of the changed price levels of every book
+    (qty 0 removes a level), 'fills' with the client's new trades and position, an
+    'ack' per actions message and a final 'settle' with the client's PnL.
+
+    Actions from every client go through one queue drained by a single task, so
+    they reach the books in arrival order and never interleave.
+    """
+    def __init__(self, market: Market, tick: float = 0.1, host: str = '127.0.0.1', port: int = 0,
+                 min_clients: int = 0, max_buffer: int = 1 << 20) -> None:
+        """
+        Args:
+            market (Market): The session. Its own trader is unused.
+            tick (float): Seconds per iteration.
+            port (int): Port to listen on, 0 for any free port (see self.port once ready).
+            min_clients (int): Wait for this many clients before the first iteration.
+            max_buffer (int): Clients with more unsent bytes than this are dropped.
+        """
+        self.market = market
+        self.tick = tick
+        self.host = host
+        self.port = port
+        self.min_clients = min_clients
+        self.max_buffer = max_buffer
+        self.depth = max(b.depth for b in market.books)
+        self.clients = {}
+        self.iteration = 0
+        self.ready = asyncio.Event()
+        self._joined = asyncio.Event()
+        self._ids = 0
+        self.sent = {b.label: ({}, {}) for b in market.books}  # levels as last broadcast
+        self._dirty = {b.label for b in market.books}
+        for b in market.books:
+            b.listeners.append(self._on_change)
+        self.stats = {"actions": 0, "messages": 0, "bytes": 0, "dropped": 0}
+
+    def _on_change(self, book: Book) -> None:
+        self._dirty.add(book.label)
+
+    def send(self, client: Client, data: bytes) -> None:
+        writer = client.writer
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            # A client this far behind would only slow everyone else down
+            self.stats["dropped"] += 1
+            writer.close()
+            return
+        writer.write(data)
+        self.stats["messages"] += 1
+        self.stats["bytes"] += len(data)
+
+    def diff(self, book: Book) -> dict:
+        """Changed levels of each side since the last broadcast, as [price, qty] pairs."""
+        res = {}
+        for name, levels, sent in (("bids", book.bids, self.sent[book.label][0]),
+                                   ("offers", book.offers, self.sent[book.label][1])):
+            now = dict(levels.ladder(self.depth))
+            changes = [[p, q] for p, q in now.items() if sent.get(p) != q]
+            changes += [[p, 0] for p in sent if p not in now]
+            sent.clear()
+            sent.update(now)
+            if changes:
+                res[name] = changes
+        return res
+
+    def publish(self) -> None:
+        """Broadcasts one diff message for the changed books, encoded once for every
+        client, then sends each client its unreported fills.
+        """
+        books = {}
+        for b in self.market.books:
+            if b.label in self._dirty:
+                changes = self.diff(b)
+                if changes:
+                    books[b.label] = changes
+        self._dirty.clear()
+        if books:
+            data = encode({"type": "book", "iteration": self.iteration, "books": books})
+            for client in list(self.clients.values()):
+                self.send(client, data)
+
+        for client in list(self.clients.values()):
+            fills = {}
+            for label, log in client.trader.log.items():
+                new = log["trades"][client.reported[label]:]
+                if new:
+                    client.reported[label] += len(new)
+                    fills[label] = {"trades": new, "position": log["position"]}
+            if fills:
+                self.send(client, encode({"type": "fills", "books": fills}))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            hello = json.loads(await reader.readline() or b'{}')
+        except ValueError:
+            hello = {}
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            writer.close()
+            return
+        self._ids += 1
+        client = Client(self._ids, str(hello.get("name", self._ids)), writer, self.market.books)
+        self.clients[client.id] = client
+        if len(self.clients) >= self.min_clients:
+            self._joined.set()
+        # The snapshot is what was last broadcast, so later diffs apply on top of it
+        self.send(client, encode({
+            "type": "welcome", "id": client.id, "iteration": self.iteration,
+            "books": [{"label": b.label, "name": b.name,
+                       "bids": list(map(list, self.sent[b.label][0].items())),
+                       "offers": list(map(list, self.sent[b.label][1].items()))}
+                      for b in self.market.books]}))
+        try:
+            while line := await reader.readline():
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(msg, dict) and msg.get("type") == "actions":
+                    await self.queue.put((client, msg.get("id"), msg.get("actions", [])))
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(client.id, None)
+            writer.close()
+
+    async def match(self) -> None:
+        """Applies queued actions in arrival order, publishing once per drained batch."""
+        market = self.market
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            acks = []
+            for client, msg_id, actions in batch:
+                if not isinstance(actions, list):
+                    actions = []
+                actions = [a for a in actions if isinstance(a, str) and market.input_valid(a)]
+                self.stats["actions"] += len(actions)
+                acks.append((client, encode({"type": "ack", "id": msg_id,
+                                             "traded": market.process_actions(actions, client.trader)})))
+            self.publish()
+            for client, data in acks:
+                self.send(client, data)
+
+    async def serve(self) -> dict:
+        """Listens, runs the session and settles every client.
+        Returns:
+            dict: PnL per client name.
+        """
+        self.queue = asyncio.Queue()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        if self.min_clients:
+            await self._joined.wait()
+
+        matcher = asyncio.create_task(self.match())
+        try:
+            for i in range(self.market.iterations):
+                self.iteration = i
+                self.market.generate_quotes(i)
+                self.publish()
+                await asyncio.sleep(self.tick)
+        finally:
+            matcher.cancel()
+            server.close()
+
+        pnls = {}
+        for client in list(self.clients.values()):
+            pnl = pnls[client.name] = client.trader.reconcile(verbose=False)
+            self.send(client, encode({"type": "settle", "pnl": pnl}))
+            client.writer.close()
+        for b in self.market.books:
+            b.listeners.remove(self._on_change)
+        return pnls
+
+async def sim_client(host: str, port: int, name: str, rate: float, rng: np.random.Generator,
+                     latencies: LatencyHistogram = None) -> dict:
+    """A simulated trader hitting and lifting at random at rate actions per second.
+    It rebuilds the books from the server's diffs and records action-to-ack latency.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({"type": "hello", "name": name}))
+    books, pending = {}, {}
+    res = {"name": name, "messages": 0, "trades": 0, "pnl": None}
+
+    async def act():
+        k = 0
+        labels = list(books)
+        while True:
+            await asyncio.sleep(rng.exponential(1 / rate))
+            action = ('h' if rng.random() < 0.5 else 'l') + labels[rng.integers(len(labels))]
+            pending[k] = time.perf_counter_ns()
+            writer.write(encode({"type": "actions", "id": k, "actions": [action]}))
+            k += 1
+
+    actor = None
+    try:
+        while line := await reader.readline():
+            msg = json.loads(line)
+            res["messages"] += 1
+            if msg["type"] == "welcome":
+                books = {b["label"]: ({p: q for p, q in b["bids"]}, {p: q for p, q in b["offers"]})
+                         for b in msg["books"]}
+                actor = asyncio.create_task(act())
+            elif msg["type"] == "book":
+                for label, changes in msg["books"].items():
+                    for side, levels in zip(("bids", "offers"), books[label]):
+                        for p, q in changes.get(side, []):
+                            if q:
+                                levels[p] = q
+                            else:
+                                levels.pop(p, None)
+            elif msg["type"] == "ack":
+                sent = pending.pop(msg["id"], None)
+                if sent is not None and latencies is not None:
+                    latencies.record(time.perf_counter_ns() - sent)
+            elif msg["type"] == "fills":
+                res["trades"] += sum(qty for f in msg["books"].values() for _, qty in f["trades"])
+            elif msg["type"] == "settle":
+                res["pnl"] = msg["pnl"]
+                break
+    finally:
+        if actor is not None:
+            actor.cancel()
+        writer.close()
+    res["books"] = books
+    return res
+
+async def load_test(n_clients: int = 100, iterations: int = 50, tick: float = 0.05,
+                    rate: float = 10, seed: int = 0) -> dict:
+    """Runs a server and n_clients simulated traders on localhost.
+    Returns:
+        dict: Throughput, ack latency percentiles (us), fan-out volume and whether
+            every client's rebuilt books match the server's.
+    """
+    books = make_books(2, iterations, depth=10)
+    market = Market(books, Trader(books, name='house'), iterations, seed=seed)
+    server = MarketServer(market, tick=tick, min_clients=n_clients)
+    session = asyncio.create_task(server.serve())
+    await server.ready.wait()
+
+    latencies = LatencyHistogram()
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_clients)]
+    start = time.perf_counter()
+    clients = await asyncio.gather(*[sim_client(server.host, server.port, f'trader {k}', rate, rng, latencies)
+                                     for k, rng in enumerate(rngs)])
+    elapsed = time.perf_counter() - start
+    pnls = await session
+
+    final = {label: tuple(sides) for label, sides in server.sent.items()}
+    return {
+        "clients": n_clients,
+        "settled": sum(c["pnl"] is not None for c in clients),
+        "actions": server.stats["actions"],
+        "actions_per_s": server.stats["actions"] / elapsed,
+        "ack_p50_us": latencies.percentile(50) / 1000,
+        "ack_p99_us": latencies.percentile(99) / 1000,
+        "messages": server.stats["messages"],
+        "mb_sent": server.stats["bytes"] / 1e6,
+        "dropped": server.stats["dropped"],
+        "consistent": all(c["books"] == final for c in clients),
+        "pnl_total": sum(pnls.values()),
+    }
+
+if __name__ == '__main__':
+    print(asyncio.run(load_test()))
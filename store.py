@@ -0,0 +1,298 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from mock_bot import Market, Option, Spread, Trader
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS configs (id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE, config TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    config_id INTEGER NOT NULL REFERENCES configs(id),
+    seed TEXT,
+    created REAL NOT NULL,
+    iterations INTEGER NOT NULL,
+    pnl REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS book_results (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    label TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    fills INTEGER NOT NULL,
+    trades TEXT,
+    settlement REAL NOT NULL,
+    theo REAL NOT NULL,
+    pnl REAL NOT NULL,
+    PRIMARY KEY (session_id, label)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_pnl ON sessions(pnl);
+CREATE INDEX IF NOT EXISTS sessions_player ON sessions(player_id, pnl);
+CREATE INDEX IF NOT EXISTS sessions_config ON sessions(config_id, pnl);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions(created);
+CREATE INDEX IF NOT EXISTS sessions_player_created ON sessions(player_id, created);
+"""
+
+BOOK_FIELDS = ('name', 'label', 'std_min', 'std_max', 'theo_min', 'theo_max', 'settlement_std',
+               'cross_prob', 'depth', 'max_qty', 'strike')
+
+def market_config(market: Market) -> dict:
+    """Describes a live session's config for the store: iteration count and per-book
+    parameters, with each book's type and option underlyings and spread legs by label.
+    It identifies sessions for queries; it is not a farm config that run_shard can build.
+    """
+    books = []
+    for b in market.books:
+        kw = {k: getattr(b, k) for k in BOOK_FIELDS if hasattr(b, k)}
+        kw["type"] = type(b).__name__
+        if isinstance(b, Option):
+            kw["underlying"] = b.underlying.label
+        elif isinstance(b, Spread):
+            kw["legs"] = [[leg.label, w] for leg, w in b.legs]
+        books.append(kw)
+    return {"iterations": market.iterations, "books": books}
+
+def _callable_key(o):
+    """JSON-able stand-in for a callable: its name, and for a partial (such as
+    as_strategy(edge_policy(edge))) its function, args and keywords, recursively.
+    """
+    if isinstance(o, functools.partial):
+        return {"func": o.func, "args": list(o.args), "keywords": o.keywords}
+    return getattr(o, '__qualname__', type(o).__name__)
+
+def config_key(config: dict) -> str:
+    """Canonical JSON of a config. Callables such as a strategy are kept by name,
+    partials with their arguments, so strategies with different parameters differ.
+    """
+    return json.dumps(config, sort_keys=True, separators=(',', ':'), default=_callable_key)
+
+def timestamp(t) -> float:
+    """Seconds since the epoch from a datetime or a number."""
+    return t.timestamp() if hasattr(t, 'timestamp') else float(t)
+
+class ResultsStore:
+    """Session results in SQLite: who played, which config and seed, and every
+    book's position, trades, settlement, theo and PnL.
+
+    Results are buffered and written batch_size sessions at a time in one
+    transaction, so ingest costs a commit per batch rather than per session.
+    Sessions can be added from many threads, and many processes can write to the
+    same file (WAL journal, with a busy timeout while another writer commits).
+    Indexes cover top-N by PnL overall, by player and by config, and date ranges.
+    """
+    def __init__(self, path: str = ':memory:', batch_size: int = 10000, timeout: float = 30.0) -> None:
+        """
+        Args:
+            path (str): Database file, created if missing, or ':memory:'.
+            batch_size (int): Sessions buffered before they are written.
+            timeout (float): Seconds to wait for another writer's lock.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # Room for the indexes' hot pages, which random PnLs and times touch all over
+        self.db.execute("PRAGMA cache_size=-65536")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self._sessions = []  # (player_id, config_id, seed, created, iterations, pnl)
+        self._books = []     # per buffered session, its book_results rows less the session id
+        self._players = {}
+        self._configs = {}
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.flush()
+            self.db.close()
+
+    def player_id(self, name: str, create: bool = True) -> int:
+        """The player's id, registering them if create. None for an unknown player otherwise."""
+        with self.lock:
+            pid = self._players.get(name)
+            if pid is None:
+                if create:
+                    self.db.execute("INSERT OR IGNORE INTO players (name) VALUES (?)", (name,))
+                row = self.db.execute("SELECT id FROM players WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    return None
+                pid = self._players[name] = row[0]
+            return pid
+
+    def config_id(self, config: dict, create: bool = True) -> int:
+        """The config's id, registering it if create. None for an unknown config otherwise."""
+        key = config_key(config)
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        with self.lock:
+            cid = self._configs.get(digest)
+            if cid is None:
+                if create:
+                    self.db.execute("INSERT OR IGNORE INTO configs (hash, config) VALUES (?, ?)", (digest, key))
+                row = self.db.execute("SELECT id FROM configs WHERE hash = ?", (digest,)).fetchone()
+                if row is None:
+                    return None
+                cid = self._configs[digest] = row[0]
+            return cid
+
+    def add(self, player: str, config: dict, seed, pnl: float, books: list[tuple], created=None) -> None:
+        """Buffers one session.
+        Args:
+            player (str): Who played it.
+            config (dict): Session config, see market_config. Must hold 'iterations'.
+            seed: Session seed, or None if it was unseeded.
+            pnl (float): Overall PnL.
+            books (list[tuple]): (label, position, fills, trades, settlement, theo, pnl)
+                per book. fills is the units traded, trades a list of (signed price, qty)
+                or None.
+            created: When the session was played (datetime or epoch seconds). Defaults to now.
+        """
+        rows = [(label, int(pos), int(fills), None if trades is None else json.dumps(trades),
+                 float(settlement), float(theo), float(book_pnl))
+                for label, pos, fills, trades, settlement, theo, book_pnl in books]
+        with self.lock:
+            session = (self.player_id(player), self.config_id(config), None if seed is None else str(seed),
+                       time.time() if created is None else timestamp(created),
+                       config["iterations"], float(pnl))
+            self.buffer([session], [rows])
+
+    def buffer(self, sessions: list[tuple], books: list[list[tuple]]) -> None:
+        """Queues ready-made sessions and book_results rows, flushing every batch_size sessions."""
+        with self.lock:
+            self._sessions += sessions
+            self._books += books
+            if len(self._sessions) >= self.batch_size:
+                self.flush()
+
+    def record(self, market: Market, trader: Trader = None, player: str = None, created=None) -> float:
+        """Buffers a finished session of market, settled for trader (default the market's).
+        Returns:
+            float: The trader's overall PnL.
+        """
+        trader = market.trader if trader is None else trader
+        book_pnls = trader.book_pnls()
+        books = [(label, v['position'], sum(qty for _, qty in v['trades']), v['trades'], v['book'].settlement,
+                  v['book'].theo, book_pnls[label]) for label, v in trader.log.items()]
+        pnl = sum(book_pnls.values())
+        self.add(trader.name if player is None else player, market_config(market), market.seed,
+                 pnl, books, created)
+        return pnl
+
+    def add_shard(self, config: dict, shard: dict, player: str, created=None) -> None:
+        """Buffers a shard of farm.run_shard results, one session per seed. Trades are
+        not kept by the farm, so only the units traded are stored.
+        """
+        labels = [kw["label"] for kw in config["books"]]
+        no_trades = [None] * len(labels)
+        n = len(shard["pnl"])
+        created = np.broadcast_to(np.asarray(time.time() if created is None else created, dtype=float), n)
+        with self.lock:
+            pid, cid = self.player_id(player), self.config_id(config)
+            sessions = list(zip([pid] * n, [cid] * n, map(str, shard["seed"].tolist()), created.tolist(),
+                                [config["iterations"]] * n, shard["pnl"].tolist()))
+            books = [list(zip(labels, pos, fills, no_trades, settlement, theo, book_pnl))
+                     for pos, fills, settlement, theo, book_pnl in zip(
+                         shard["position"].tolist(), shard["fills"].tolist(), shard["settlement"].tolist(),
+                         shard["theo"].tolist(), shard["book_pnl"].tolist())]
+            self.buffer(sessions, books)
+
+    def flush(self) -> int:
+        """Writes the buffered sessions in one transaction. Returns how many were written."""
+        with self.lock:
+            sessions, books = self._sessions, self._books
+            self._sessions, self._books = [], []
+            if not sessions:
+                return 0
+            # BEGIN IMMEDIATE takes the write lock up front, so the ids below are ours
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                first = self.db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sessions").fetchone()[0]
+                self.db.executemany(
+                    "INSERT INTO sessions (id, player_id, config_id, seed, created, iterations, pnl) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(first + k,) + s for k, s in enumerate(sessions)])
+                self.db.executemany(
+                    "INSERT INTO book_results (session_id, label, position, fills, trades, settlement, theo, pnl) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(first + k,) + row for k, rows in enumerate(books) for row in rows])
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return len(sessions)
+
+    def query(self, sql: str, args=()) -> list[tuple]:
+        """Runs a read query, never in the middle of another thread's flush."""
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def top(self, n: int = 10, player: str = None, config: dict = None, since=None, until=None) -> list[dict]:
+        """The n best sessions by PnL, optionally for one player, one config and a date range."""
+        self.flush()
+        where, args = [], []
+        if player is not None:
+            where.append("s.player_id = ?")
+            args.append(self.player_id(player, create=False))
+        if config is not None:
+            where.append("s.config_id = ?")
+            args.append(self.config_id(config, create=False))
+        if None in args:
+            return []
+        if since is not None:
+            where.append("s.created >= ?")
+            args.append(timestamp(since))
+        if until is not None:
+            where.append("s.created < ?")
+            args.append(timestamp(until))
+        rows = self.query(
+            "SELECT s.id, p.name, s.seed, s.created, s.pnl FROM sessions s JOIN players p ON p.id = s.player_id "
+            + ("WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY s.pnl DESC LIMIT ?", args + [n])
+        return [{"session": sid, "player": name, "seed": seed, "created": created, "pnl": pnl}
+                for sid, name, seed, created, pnl in rows]
+
+    def leaderboard(self, n: int = 10, config: dict = None, min_sessions: int = 1) -> list[dict]:
+        """Players ranked by mean PnL, with session counts and best session."""
+        self.flush()
+        where, args = "", []
+        if config is not None:
+            where, args = "WHERE s.config_id = ?", [self.config_id(config, create=False)]
+            if args[0] is None:
+                return []
+        rows = self.query(
+            "SELECT p.name, COUNT(*), AVG(s.pnl), MAX(s.pnl) FROM sessions s "
+            f"JOIN players p ON p.id = s.player_id {where} GROUP BY s.player_id "
+            "HAVING COUNT(*) >= ? ORDER BY AVG(s.pnl) DESC LIMIT ?", args + [min_sessions, n])
+        return [{"player": name, "sessions": count, "pnl_mean": mean, "pnl_best": best}
+                for name, count, mean, best in rows]
+
+    def history(self, player: str, since=None, until=None) -> list[tuple[float, float]]:
+        """A player's (created, pnl) per session in time order, for trends."""
+        self.flush()
+        pid = self.player_id(player, create=False)
+        if pid is None:
+            return []
+        return self.query(
+            "SELECT created, pnl FROM sessions WHERE player_id = ? AND created >= ? AND created < ? "
+            "ORDER BY created", (pid, -np.inf if since is None else timestamp(since),
+                                 np.inf if until is None else timestamp(until)))
+
+    def books(self, session_id: int) -> dict:
+        """Per-book results of one session, keyed by label."""
+        self.flush()
+        rows = self.query(
+            "SELECT label, position, fills, trades, settlement, theo, pnl FROM book_results "
+            "WHERE session_id = ?", (session_id,))
+        return {label: {"position": pos, "fills": fills,
+                        "trades": None if trades is None else list(map(tuple, json.loads(trades))),
+                        "settlement": settlement, "theo": theo, "pnl": pnl}
+                for label, pos, fills, trades, settlement, theo, pnl in rows}
@@ -0,0 +1,133 @@
+import shutil
+import tempfile
+from contextlib import ExitStack
+import numpy as np
+from mock_bot import Bid, Offer, Book
+from monte_carlo import draw_sessions
+
+MAGIC = b'QTAPE001'
+HEADER_SIZE = 64
+
+# Row columns in file order: name -> dtype
+COLUMNS = {
+    "iteration": np.dtype('<u4'),
+    "book": np.dtype('<u2'),
+    "price": np.dtype('<i4'),
+    "side": np.dtype('i1'),
+    "cross": np.dtype('u1'),
+}
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+def _layout(n_sessions: int, n_books: int, n_rows: int) -> dict:
+    """Byte offset, dtype and shape of every section of a tape file."""
+    sections = {
+        "theo": (np.dtype('<f8'), (n_sessions, n_books)),
+        "settlement": (np.dtype('<f8'), (n_sessions, n_books)),
+        "offsets": (np.dtype('<i8'), (n_sessions + 1,)),
+    }
+    sections.update({k: (dtype, (n_rows,)) for k, dtype in COLUMNS.items()})
+
+    layout = {}
+    offset = HEADER_SIZE
+    for name, (dtype, shape) in sections.items():
+        layout[name] = (offset, dtype, shape)
+        offset = _align(offset + dtype.itemsize * int(np.prod(shape)))
+    return layout
+
+def write_tape(path: str, books: list[Book], n_sessions: int, iterations: int,
+               chunk_size: int = 10000, seed: int = None) -> None:
+    """Pre-generate quotes for n_sessions sessions and write them as a quote tape.
+
+    The file is a 64 byte header (magic, n_sessions, n_books, n_rows, iterations)
+    followed by per-session theo/settlement arrays, per-session row offsets and
+    one contiguous little-endian column per quote field. Rows are ordered by
+    session, then iteration. There is no qty column: quotes are drawn as by
+    draw_sessions, at unit size, so max_qty is not represented.
+
+    Args:
+        path (str): Output file.
+        books (list[Book]): Template books, in the order Market will hold them.
+            Market.run only replays the tape on a market of as many books.
+        n_sessions (int): Number of sessions to generate.
+        iterations (int): Number of iterations per session.
+        chunk_size (int): Sessions drawn per batch. Each batch's quote columns are cast
+            to their file dtypes and spooled to temporary files, so peak memory is one
+            batch's draws plus the (n_sessions, n_books) theos and settlements.
+        seed (int): Seed for the tape. The same seed always writes the same tape.
+    """
+    n_books = len(books)
+    theo, settlement, counts = [], [], []
+    chunk_seeds = np.random.SeedSequence(seed).spawn((n_sessions + chunk_size - 1) // chunk_size)
+    with ExitStack() as stack:
+        # The row count, and so the column offsets, are only known once every chunk is drawn
+        spools = {k: stack.enter_context(tempfile.TemporaryFile()) for k in COLUMNS}
+        for start, chunk_seed in zip(range(0, n_sessions, chunk_size), chunk_seeds):
+            draws = draw_sessions(books, min(chunk_size, n_sessions - start), iterations,
+                                  rng=np.random.default_rng(chunk_seed))
+            session, iteration, book = np.nonzero(draws["quoting"])
+            theo.append(draws["theo"])
+            settlement.append(draws["settlement"])
+            counts.append(np.bincount(session, minlength=len(draws["theo"])))
+            columns = {
+                "iteration": iteration,
+                "book": book,
+                "price": draws["price"][session, iteration, book],
+                "side": np.where(draws["is_bid"][session, iteration, book], Bid, Offer),
+                "cross": draws["cross"][session, iteration, book],
+            }
+            for k, dtype in COLUMNS.items():
+                spools[k].write(np.ascontiguousarray(columns[k], dtype=dtype).tobytes())
+            del draws, columns
+
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(counts))])
+        data = {
+            "theo": np.concatenate(theo),
+            "settlement": np.concatenate(settlement),
+            "offsets": offsets,
+        }
+
+        n_rows = int(offsets[-1])
+        layout = _layout(n_sessions, n_books, n_rows)
+        with open(path, 'wb') as f:
+            header = MAGIC + np.array([n_sessions, n_books, n_rows, iterations], dtype='<u8').tobytes()
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+            for name, (offset, dtype, shape) in layout.items():
+                f.write(b'\0' * (offset - f.tell()))
+                if name in spools:
+                    spools[name].seek(0)
+                    shutil.copyfileobj(spools[name], f, 1 << 20)
+                else:
+                    f.write(np.ascontiguousarray(data[name], dtype=dtype).reshape(shape).tobytes())
+
+class QuoteTape:
+    """Read-only, memory-mapped view of a quote tape written by write_tape."""
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:8] != MAGIC:
+            raise ValueError(f"{path} is not a quote tape")
+        self.path = path
+        self.n_sessions, self.n_books, self.n_rows, self.iterations = (
+            int(x) for x in np.frombuffer(header, dtype='<u8', count=4, offset=8))
+
+        self.columns = {}
+        for name, (offset, dtype, shape) in _layout(self.n_sessions, self.n_books, self.n_rows).items():
+            if 0 in shape:
+                self.columns[name] = np.empty(shape, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def __len__(self) -> int:
+        return self.n_sessions
+
+    def session(self, session: int) -> dict:
+        """Returns zero-copy column slices and book theos/settlements for one session.
+        Market.run copies the slices into a quote batch, one session at a time.
+        """
+        start, stop = self.columns["offsets"][session:session + 2]
+        res = {k: self.columns[k][start:stop] for k in COLUMNS}
+        res["theo"] = self.columns["theo"][session]
+        res["settlement"] = self.columns["settlement"][session]
+        return res
@@ -0,0 +1,330 @@
+import pytest
+from mock_bot import BOOK_PARAMS, Bid, Book, Call, Market, Offer, PriceLevels, Spread, Trader
+
+def make_book(label: str = 'a', depth: int = 5) -> Book:
+    return Book(name=f'Future {label.upper()}', label=label, iterations=20, depth=depth, verbose=False, **BOOK_PARAMS)
+
+def test_match_is_price_time_fifo():
+    offers = PriceLevels(Offer)
+    first = offers.append(101, 2)
+    second = offers.append(101, 3)
+    better = offers.append(100, 1)
+    fills = offers.match(4)
+    assert [(o.id, qty) for o, qty in fills] == [(better.id, 1), (first.id, 2), (second.id, 1)]
+    assert second.qty == 2 and len(offers) == 1 and offers.best() == 101
+
+def test_match_partial_fill_keeps_queue_position():
+    bids = PriceLevels(Bid)
+    first = bids.append(100, 5)
+    second = bids.append(100, 1)
+    assert [(o.id, qty) for o, qty in bids.match(3)] == [(first.id, 3)]
+    assert [o.id for o, _ in bids.match(3)] == [first.id, second.id]
+    assert not bids
+
+def test_match_sweeps_levels_up_to_limit():
+    offers = PriceLevels(Offer)
+    for price in (100, 101, 102, 103):
+        offers.append(price, 2)
+    fills = offers.match(10, limit=102)
+    assert [(o.price, qty) for o, qty in fills] == [(100, 2), (101, 2)]
+    fills = offers.match(10, limit=102, inclusive=True)
+    assert [(o.price, qty) for o, qty in fills] == [(102, 2)]
+    assert list(offers) == [103]
+
+def test_submit_trades_through_and_rests_remainder():
+    book = make_book()
+    book.rest(100, Offer, 2)
+    book.rest(101, Offer, 2)
+    book.rest(103, Offer, 1)
+    trader = Trader([book], name='t')
+    order, trades = book.submit(Bid, 101, 5, trader)
+    assert trades == [(100, 2), (101, 2)]
+    assert order.qty == 1 and order.price == 101 and book.orders == {order.id: order}
+    assert book.bids.best() == 101 and book.offers.best() == 103
+
+def test_submit_keeps_user_order_past_depth():
+    book = make_book(depth=5)
+    for price in range(100, 105):
+        book.rest(price, Bid)
+    order, _ = book.submit(Bid, 90, 1, Trader([book], name='t'))
+    assert order.id in book.orders and 90 in book.bids
+    book.rest(99, Bid)
+    # Depth applies to bot quotes: the worst bot bid goes, the user order stays
+    assert sorted(book.bids) == [90, 100, 101, 102, 103, 104]
+
+def test_passive_fill_books_with_owner_and_prunes_order():
+    book = make_book()
+    trader = Trader([book], name='t')
+    order, _ = book.submit(Offer, 110, 3, trader)
+    book.match_quote(112, Bid, 2)
+    assert trader.log['a']['position'] == -2 and trader.log['a']['trades'] == [(-110, 2)]
+    book.match_quote(112, Bid, 1)
+    assert order.id not in book.orders and trader.log['a']['position'] == -3
+
+def test_cancel_and_amend():
+    book = make_book()
+    trader = Trader([book], name='t')
+    first, _ = book.submit(Bid, 100, 3, trader)
+    second, _ = book.submit(Bid, 100, 1, trader)
+    # Reducing size keeps queue priority
+    order, _ = book.amend(first.id, qty=2)
+    assert order is first and [o.id for o, _ in book.bids.match(3)] == [first.id, second.id]
+
+    third, _ = book.submit(Bid, 100, 1, trader)
+    fourth, _ = book.submit(Bid, 100, 1, trader)
+    # A price change requeues under the same id
+    order, _ = book.amend(third.id, price=100, qty=2)
+    assert order.id == third.id and list(book.bids._levels[100]) == [fourth.id, third.id]
+    assert book.cancel(third.id) is order and book.cancel(third.id) is None
+    assert book.amend(third.id, qty=1) == (None, [])
+
+def test_market_cancel_only_by_owner():
+    book = make_book()
+    owner, other = Trader([book], name='owner'), Trader([book], name='other')
+    market = Market([book], owner, 20, seed=0)
+    market.process_actions(['b2a@50'], owner)
+    (order_id,) = book.orders
+    market.process_actions([f'c{order_id}'], other)
+    assert market.order_book(order_id) is book
+    market.process_actions([f'c{order_id}'], owner)
+    assert market.order_book(order_id) is None
+
+def test_sized_fills_reconcile_with_position():
+    book = make_book()
+    book.rest(100, Offer, 2)
+    book.rest(101, Offer, 3)
+    trader = Trader([book], name='t')
+    market = Market([book], trader, 20)
+    market.process_actions(['l4a'])
+    trades = trader.log['a']['trades']
+    assert trades == [(100, 2), (101, 2)]
+    assert sum(qty for _, qty in trades) == trader.log['a']['position'] == 4
+
+@pytest.fixture
+def market():
+    a = make_book('a')
+    books = [a, Call(a, 150, verbose=False), make_book('2'), make_book('12')]
+    return Market(books, Trader(books, name='t'), 20)
+
+@pytest.mark.parametrize("action, expected", [
+    ('la', ('l', 1, 'a', None)),
+    ('l5a', ('l', 5, 'a', None)),
+    ('l150a', ('l', 150, 'a', None)),
+    ('ha150c', ('h', 1, 'a150c', None)),
+    ('h3a150c', ('h', 3, 'a150c', None)),
+    ('h12', ('h', 1, '12', None)),
+    ('h32', ('h', 3, '2', None)),
+    ('b2a150c@7', ('b', 2, 'a150c', 7)),
+    ('c12', ('c', None, 12, None)),
+    ('m12@121x2', ('m', 2, 12, 121)),
+    ('l0a', None),
+    ('lz', None),
+    ('ba', None),
+])
+def test_split_action(market, action, expected):
+    assert market.split_action(action) == expected
+
+def test_average_entry_price_blends_adds():
+    book = make_book()
+    trader = Trader([book], name='t')
+    trader.process_action(100, 'a', qty=2)
+    trader.process_action(106, 'a', qty=1)
+    v = trader.log['a']
+    assert v['position'] == 3 and v['avg_price'] == pytest.approx(102)
+    assert v['cash'] == -306 and v['realized'] == 0
+
+def test_realized_pnl_on_reduce_and_flip():
+    book = make_book()
+    trader = Trader([book], name='t')
+    trader.process_action(100, 'a', qty=2)
+    trader.process_action(-110, 'a', qty=1)  # sell 1 of 2
+    v = trader.log['a']
+    assert v['position'] == 1 and v['avg_price'] == 100 and v['realized'] == 10
+
+    trader.process_action(-90, 'a', qty=3)  # sell through zero to short 2
+    assert v['position'] == -2 and v['avg_price'] == 90 and v['realized'] == 0
+    trader.process_action(95, 'a', qty=2)  # buy back flat
+    assert v['position'] == 0 and v['avg_price'] == 0 and v['realized'] == -10
+
+def test_zero_price_fill_needs_explicit_side():
+    a, b = make_book('a'), make_book('b')
+    spread = Spread([(a, 1), (b, -1)], verbose=False)
+    trader = Trader([spread], name='t')
+    trader.process_action(0, spread.label, side=1, qty=2)
+    trader.process_action(-5, spread.label, side=-1, qty=1)
+    v = trader.log[spread.label]
+    assert v['position'] == 1 and v['avg_price'] == 0 and v['realized'] == 5 and v['cash'] == 5
+
+def test_settled_pnl_matches_trade_sum():
+    book = make_book()
+    trader = Trader([book], name='t')
+    fills = [(100, 2), (-104, 1), (-98, 4), (101, 1), (-107, 2)]
+    for trade, qty in fills:
+        trader.process_action(trade, 'a', qty=qty)
+    v = trader.log['a']
+    position = sum(qty if trade > 0 else -qty for trade, qty in fills)
+    # The pre-ledger formula: settlement * position less what the trades paid
+    old = book.settlement * position - sum(trade * qty for trade, qty in fills)
+    assert v['position'] == position
+    assert v['cash'] + v['position'] * book.settlement == pytest.approx(old)
+    assert trader.book_pnls()['a'] == round(old, 2)
+    assert trader.reconcile(verbose=False) == pytest.approx(round(old, 2))
+
+def test_store_queries_do_not_register_players_or_configs():
+    from store import ResultsStore
+    config = {"iterations": 20, "books": []}
+    store = ResultsStore()
+    store.add('alice', config, 1, 10.0, [('a', 1, 2, [(100, 1), (-110, 1)], 120.0, 118.0, 10.0)])
+    assert store.top(player='nobody') == [] and store.history('nobody') == []
+    assert store.leaderboard(config={"iterations": 5, "books": []}) == []
+    assert store.query("SELECT name FROM players") == [('alice',)]
+    assert store.query("SELECT COUNT(*) FROM configs") == [(1,)]
+    (best,) = store.top(player='alice', config=config)
+    assert best["pnl"] == 10.0 and store.books(best["session"])['a']["trades"] == [(100, 1), (-110, 1)]
+    store.close()
+
+def test_tape_replay_checks_shape(tmp_path):
+    from tape import QuoteTape, write_tape
+    path = str(tmp_path / 'quotes.tape')
+    write_tape(path, [make_book('a'), make_book('b')], n_sessions=2, iterations=20, seed=0)
+    tape = QuoteTape(path)
+    for books, iterations in (([make_book('a')], 20), ([make_book(l) for l in 'abc'], 20),
+                              ([make_book('a'), make_book('b')], 10)):
+        with pytest.raises(ValueError):
+            Market(books, Trader(books, name='t'), iterations).run(tape=tape)
+    books = [make_book('a'), make_book('b')]
+    with pytest.raises(ValueError):
+        Market(books, Trader(books, name='t'), 20).run(tape=tape, session=2)
+    Market(books, Trader(books, name='t'), 20).run(tape=tape, session=1)
+
+def test_option_theo_uses_remaining_path_variance():
+    from mock_bot import option_theo
+    a = make_book('a')
+    call = Call(a, 175, verbose=False)
+    market = Market([a, call], Trader([a, call], name='t'), 20, seed=0)
+    assert call.theo == pytest.approx(option_theo(a.theo, 175, a.settlement_std, True))
+    market.draw_theo_paths(vol=2.0)
+    for i in (0, 10, 19):
+        market.generate_quotes(i)
+        assert a.remaining_std == pytest.approx(2.0 * (20 - i) ** 0.5)
+        assert call.theo == pytest.approx(option_theo(a.theo, 175, a.remaining_std, True))
+
+def test_option_needs_a_payoff():
+    from mock_bot import Option
+    with pytest.raises(TypeError):
+        Option(make_book('a'), 150, verbose=False)
+
+def test_store_keys_strategies_by_parameters():
+    from farm import default_config
+    from monte_carlo import as_strategy, edge_policy
+    from store import ResultsStore, config_key
+    configs = [default_config(), dict(default_config(), strategy=as_strategy(edge_policy(50)))]
+    assert config_key(configs[0]) != config_key(configs[1])
+    assert config_key(configs[0]) == config_key(default_config())
+    store = ResultsStore()
+    for config in configs:
+        store.add('alice', config, 1, 1.0, [])
+    assert store.query("SELECT COUNT(*) FROM configs") == [(2,)]
+    assert len(store.top(config=configs[1])) == 1
+    store.close()
+
+def test_risk_incremental_matches_fresh_engine():
+    import numpy as np
+    from mock_bot import Put, make_books
+    from risk import RiskEngine
+    a, b, c = make_books(3)
+    books = [a, b, c, Call(a, 175, verbose=False), Put(b, 150, verbose=False),
+             Spread([(a, 1), (c, -1)], verbose=False)]
+    trader = Trader(books, name='t')
+    engine = RiskEngine(trader, 2000, rng=np.random.default_rng(0))
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        engine.evaluate()
+        for book in (a, b, c):
+            book.theo += rng.normal(0, 2)
+        for k in rng.integers(len(books), size=2).tolist():
+            side = 1 if rng.random() < 0.5 else -1
+            trader.process_action(side * round(books[k].theo), books[k].label, side)
+    got = engine.evaluate()
+    want = RiskEngine(trader, 2000, rng=np.random.default_rng(0)).evaluate()
+    for key in ('expected', 'std', 'var', 'es'):
+        assert got[key] == pytest.approx(want[key])
+    for label, v in want['books'].items():
+        assert got['books'][label] == pytest.approx(v)
+
+def test_risk_reprices_option_only_when_its_underlying_moves():
+    import numpy as np
+    from mock_bot import make_books
+    from risk import RiskEngine
+    a, b = make_books(2)
+    call = Call(a, 175, verbose=False)
+    trader = Trader([a, b, call], name='t')
+    engine = RiskEngine(trader, 1000, rng=np.random.default_rng(0))
+    trader.process_action(round(call.theo) or 1, call.label, 1)
+    engine.evaluate()
+    column = engine._columns[call.label][0]
+    b.theo += 5
+    engine.evaluate()
+    assert engine._columns[call.label][0] is column
+    a.theo += 5
+    engine.evaluate()
+    assert engine._columns[call.label][0] is not column
+
+def test_server_loopback_handshake_diffs_and_malformed_lines():
+    import asyncio
+    import json
+    from mock_bot import make_books
+    from server import MarketServer
+
+    async def session():
+        books = make_books(2, 5, depth=10)
+        server = MarketServer(Market(books, Trader(books, name='house'), 5, seed=0), tick=0.01, min_clients=1)
+        serving = asyncio.create_task(server.serve())
+        await server.ready.wait()
+
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(b'[1]\n')  # valid JSON, not an object: closed without a welcome
+        assert await reader.readline() == b''
+        writer.close()
+
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(b'{"type": "hello", "name": "alice"}\n')
+        welcome = json.loads(await reader.readline())
+        assert welcome["type"] == "welcome" and [b["label"] for b in welcome["books"]] == ['a', 'b']
+        levels = {b["label"]: ({p: q for p, q in b["bids"]}, {p: q for p, q in b["offers"]})
+                  for b in welcome["books"]}
+        writer.write(b'5\n"x"\nnot json\n{"type": "actions", "id": 1, "actions": ["ba@1"]}\n')
+        messages = []
+        while line := await reader.readline():
+            messages.append(json.loads(line))
+        writer.close()
+        return server, await serving, levels, messages
+
+    server, pnls, levels, messages = asyncio.run(session())
+    kinds = [m["type"] for m in messages]
+    assert "book" in kinds and kinds[-1] == "settle" and pnls == {"alice": messages[-1]["pnl"]}
+    assert [m["id"] for m in messages if m["type"] == "ack"] == [1]
+    for m in messages:
+        if m["type"] == "book":
+            for label, changes in m["books"].items():
+                for side, key in ((0, "bids"), (1, "offers")):
+                    for price, qty in changes.get(key, []):
+                        if qty:
+                            levels[label][side][price] = qty
+                        else:
+                            levels[label][side].pop(price, None)
+    for b in server.market.books:
+        assert levels[b.label] == tuple(dict(server.sent[b.label][i]) for i in (0, 1))
+
+def test_market_order_index_follows_fills_amends_and_cancels():
+    book = make_book()
+    trader = Trader([book], name='t')
+    market = Market([book], trader, 20, seed=0)
+    market.process_actions(['b2a@50', 'o1a@400'], trader)
+    bid, offer = sorted(book.orders)
+    assert market.order_books == {bid: book, offer: book}
+    market.process_actions([f'm{bid}@51'], trader)  # requeued under the same id
+    assert market.order_book(bid) is book
+    book.match_quote(40, Offer, 2)
+    book.cancel(offer)
+    assert market.order_books == {}